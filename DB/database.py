@@ -1,14 +1,113 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+from config import env
+
 SQLITE_DATABASE_URL = "sqlite:///./GlobalDataBase.db"
 
-engine = create_engine(SQLITE_DATABASE_URL, connect_args={"check_same_thread": False})
+
+def normalize_database_url(url: str) -> str:
+    # Les hébergeurs (Heroku...) fournissent encore le préfixe "postgres://"
+    if url.startswith("postgres://"):
+        return "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+DATABASE_URL = normalize_database_url(env("DATABASE_URL", SQLITE_DATABASE_URL))
+
+# SQLite : WAL (lectures concurrentes pendant une écriture), fsync allégé, lecture mmap
+SQLITE_BUSY_TIMEOUT_MS = int(env("DB_SQLITE_BUSY_TIMEOUT_MS", 5000))
+SQLITE_MMAP_SIZE = int(env("DB_SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+SQLITE_SYNCHRONOUS = env("DB_SQLITE_SYNCHRONOUS", "NORMAL")
+
+# PostgreSQL : pool par worker
+DB_POOL_SIZE = int(env("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(env("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(env("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(env("DB_POOL_RECYCLE", 1800))
+
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def apply_sqlite_pragmas(dbapi_connection):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+def async_database_url(url: str) -> str:
+    """Même base, pilote asynchrone : aiosqlite en local, asyncpg pour PostgreSQL."""
+    scheme, rest = url.split("://", 1)
+    dialect = scheme.split("+", 1)[0]
+    if dialect == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    if dialect == "postgresql":
+        return f"postgresql+asyncpg://{rest}"
+    return url
+
+
+def create_db_engine(url: str = DATABASE_URL, **kwargs):
+    """Moteur synchrone : pragmas appliqués à chaque connexion SQLite, pool réglé pour PostgreSQL."""
+    if is_sqlite(url):
+        engine = create_engine(
+            url,
+            connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+            **kwargs
+        )
+        event.listen(engine, "connect", lambda dbapi_connection, _: apply_sqlite_pragmas(dbapi_connection))
+        return engine
+    return create_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+        **kwargs
+    )
+
+
+def create_async_db_engine(url: str = DATABASE_URL, **kwargs):
+    """Moteur asynchrone, mêmes réglages que create_db_engine."""
+    url = async_database_url(url)
+    if is_sqlite(url):
+        engine = create_async_engine(url, connect_args={"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}, **kwargs)
+        event.listen(engine.sync_engine, "connect",
+                     lambda dbapi_connection, _: apply_sqlite_pragmas(dbapi_connection))
+        return engine
+    return create_async_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+        **kwargs
+    )
+
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Sessions asynchrones pour les endpoints : aucune requête SQL ne bloque l'event loop.
+# expire_on_commit=False : les objets restent lisibles après commit sans nouveau SELECT implicite.
+async_engine = create_async_db_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
 Base = declarative_base()
 def get_session():
     session = SessionLocal()
     try: yield session
     finally: session.close()
+
+
+async def get_async_session():
+    async with AsyncSessionLocal() as session:
+        yield session
@@ -0,0 +1,158 @@
+"""
+Import des données de référence (JSON) dans les tables ref_* indexées.
+
+Usage (depuis la racine du projet, après `alembic upgrade head`) :
+    python -m DB.import_reference [--only traitements,besoins_irrigation,catalogues] [--force]
+
+Idempotent : un jeu n'est réimporté que si le hash du fichier source a changé
+(ou avec --force). Chaque jeu est remplacé dans une seule transaction, et les
+workers de l'API détectent le nouvel import via la table ref_imports.
+"""
+import argparse
+import hashlib
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from DB.database import SessionLocal
+from DB.models import (
+    ReferenceImport, TreatmentReference, IrrigationNeedReference, CatalogueReference, ProduitReference
+)
+from DB.reference import reference_key
+from Irrigation.IrrigationLogic import normalize
+
+ROOT = Path(__file__).resolve().parents[1]
+SOURCES = {
+    "traitements": ROOT / "DB" / "versionFinale.json",
+    "besoins_irrigation": ROOT / "Irrigation" / "data" / "BesoinNet.json",
+    "catalogues": ROOT / "storage" / "catalogue_complet.json",
+}
+
+
+def _import_traitements(db: Session, data: list) -> int:
+    db.execute(delete(TreatmentReference))
+    rows = [
+        {
+            "position": position,
+            "plant_key": reference_key(entry["Plant"]),
+            "disease_key": reference_key(entry["Disease"]),
+            "gravite": entry.get("Gravité ciblée"),
+            "stade": entry.get("Stade recommandé"),
+            "dar": str(entry.get("DAR")).strip(),
+            "matiere_active": entry.get("matiéres actives"),
+            "entry": entry,
+        }
+        for position, entry in enumerate(data)
+        if entry.get("Plant") and entry.get("Disease")
+    ]
+    if rows:
+        db.execute(insert(TreatmentReference), rows)
+    return len(rows)
+
+
+def _import_besoins_irrigation(db: Session, data: list) -> int:
+    db.execute(delete(IrrigationNeedReference))
+    # Comme l'ancien index en mémoire : la dernière entrée d'une même clé l'emporte
+    rows = {}
+    for item in data:
+        key = (normalize(item["Culture"]), normalize(item["Type de sol"]), normalize(item["Saison"]))
+        rows[key] = {
+            "culture": item["Culture"],
+            "type_sol": item["Type de sol"],
+            "saison": item["Saison"],
+            "culture_key": key[0],
+            "type_sol_key": key[1],
+            "saison_key": key[2],
+            "frequence_irrigation": item["Fréquence d'irrigation (par semaine)"],
+            "besoin_quotidien": item["Besoin quotidien (m³/ha/jour)"],
+        }
+    if rows:
+        db.execute(insert(IrrigationNeedReference), list(rows.values()))
+    return len(rows)
+
+
+def _import_catalogues(db: Session, data: list) -> int:
+    db.execute(delete(ProduitReference))
+    db.execute(delete(CatalogueReference))
+    ids = db.scalars(
+        insert(CatalogueReference).returning(CatalogueReference.id, sort_by_parameter_order=True),
+        [
+            {"nom": catalogue["catalogue"], "nom_key": reference_key(catalogue["catalogue"]),
+             "liens_sites": catalogue.get("liens_sites", [])}
+            for catalogue in data
+        ],
+    ).all() if data else []
+    produits = [
+        {"catalogue_id": catalogue_id, "position": position, "nom": produit.get("nom", ""),
+         "description": produit.get("description"), "image": produit.get("image")}
+        for catalogue, catalogue_id in zip(data, ids)
+        for position, produit in enumerate(catalogue.get("produits", []))
+    ]
+    if produits:
+        db.execute(insert(ProduitReference), produits)
+    return len(ids)
+
+
+IMPORTERS = {
+    "traitements": _import_traitements,
+    "besoins_irrigation": _import_besoins_irrigation,
+    "catalogues": _import_catalogues,
+}
+
+
+def import_reference(db: Session, name: str, path: Path = None, force: bool = False):
+    """Importe un jeu de référence ; renvoie le nombre de lignes, ou None s'il était déjà à jour."""
+    path = Path(path or SOURCES[name])
+    raw = path.read_bytes()
+    digest = hashlib.sha256(raw).hexdigest()
+
+    current = db.get(ReferenceImport, name)
+    if current is not None and current.sha256 == digest and not force:
+        return None
+
+    rows = IMPORTERS[name](db, json.loads(raw.decode("utf-8")))
+    if current is None:
+        db.add(ReferenceImport(name=name, sha256=digest, rows=rows))
+    else:
+        current.sha256, current.rows = digest, rows
+        current.imported_at = datetime.now(timezone.utc)
+    db.commit()
+    return rows
+
+
+def import_missing_reference_data():
+    """Importe les jeux jamais importés (premier démarrage sans `python -m DB.import_reference`)."""
+    with SessionLocal() as db:
+        imported = set(db.scalars(select(ReferenceImport.name)).all())
+        for name in IMPORTERS:
+            if name not in imported:
+                try:
+                    import_reference(db, name)
+                except IntegrityError:
+                    # Un autre worker vient de faire le même import
+                    db.rollback()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", default=",".join(IMPORTERS), help="Jeux à importer, séparés par des virgules")
+    parser.add_argument("--force", action="store_true", help="Réimporter même si le fichier n'a pas changé")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        for name in [n.strip() for n in args.only.split(",") if n.strip()]:
+            if name not in IMPORTERS:
+                parser.error(f"Jeu inconnu : {name} (attendu : {', '.join(IMPORTERS)})")
+            rows = import_reference(db, name, force=args.force)
+            if rows is None:
+                print(f"= {name} : déjà à jour")
+            else:
+                print(f"✅ {name} : {rows} ligne(s) importée(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from DB.database import SessionLocal
+from DB.models import SchedulerLock
+
+
+def utcnow() -> datetime:
+    # Colonnes DateTime sans fuseau : on stocke de l'UTC naïf
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def acquire_lock(name: str, owner: str, ttl: float) -> bool:
+    """
+    Prend (ou prolonge) le bail `name` pour `owner` s'il est libre ou expiré.
+    Un UPDATE conditionnel puis un INSERT : atomique sur SQLite comme sur PostgreSQL.
+    """
+    now = utcnow()
+    expires_at = now + timedelta(seconds=ttl)
+    with SessionLocal() as db:
+        taken = db.execute(
+            update(SchedulerLock)
+            .where(SchedulerLock.name == name)
+            .where(or_(SchedulerLock.owner == owner, SchedulerLock.expires_at < now))
+            .values(owner=owner, expires_at=expires_at)
+        ).rowcount
+        if not taken:
+            try:
+                db.execute(insert(SchedulerLock).values(name=name, owner=owner, expires_at=expires_at))
+                taken = 1
+            except IntegrityError:
+                db.rollback()
+                return False
+        db.commit()
+        return bool(taken)
+
+
+def release_lock(name: str, owner: str):
+    with SessionLocal() as db:
+        db.execute(
+            update(SchedulerLock)
+            .where(SchedulerLock.name == name, SchedulerLock.owner == owner)
+            .values(expires_at=utcnow())
+        )
+        db.commit()
@@ -7,7 +7,7 @@ from passlib.handlers.bcrypt import bcrypt
 from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Text
 
 from sqlalchemy.orm import DeclarativeBase, relationship, Mapped, mapped_column
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from DB.database import Base
@@ -27,9 +27,30 @@ class IrrigationRecord(Base):
     irrigation_necessaire = Column(Boolean)
     timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
+    # Décision météo tenue à jour par Irrigation/scheduler.py
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    weather_cell = Column(String, index=True, nullable=True)  # "lat,lon" de la maille météo
+    pluie_prevue_mm = Column(Float, nullable=True)  # pluie prévue sur 24h
+    meteo_updated_at = Column(DateTime, nullable=True)
+
     user_id = Column(Integer, ForeignKey("utilisateurs.id"))
     user = relationship("UserDB")
 
+    # Historique par utilisateur, pagination par curseur (voir pagination.py)
+    __table_args__ = (
+        Index("ix_irrigation_records_user_history", "user_id", "id"),
+    )
+
+
+class SchedulerLock(Base):
+    """Bail en base : une seule instance (worker gunicorn) exécute une tâche planifiée à la fois."""
+    __tablename__ = "scheduler_locks"
+
+    name = Column(String, primary_key=True)
+    owner = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
 class UserDB(Base):
     __tablename__ = "utilisateurs"
 
@@ -67,12 +88,18 @@ class CropRecommendation(Base):
     critere_stade = Column(String, nullable=True)
     critere_dar = Column(String, nullable=True)
 
+    __table_args__ = (
+        Index("ix_crop_recommendations_user_history", "user_id", "id"),
+    )
+
 class ImagePrediction(Base):
     __tablename__ = "image_predictions"
 
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, index=True)
     prediction = Column(String)
+    confidence = Column(Float, nullable=True)  # probabilité softmax du label prédit
+    top_k = Column(String, nullable=True)  # "index:proba,..." (voir PlantDiseaseModel.encode_top_k)
     file_path = Column(String)  # New field for storing file path
     timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
@@ -87,6 +114,10 @@ class ImagePrediction(Base):
     critere_stade = Column(String, nullable=True)
     critere_dar = Column(String, nullable=True)
 
+    __table_args__ = (
+        Index("ix_image_predictions_user_history", "user_id", "id"),
+    )
+
 class ChatbotInteraction(Base):
     __tablename__ = "chatbot_interactions"
 
@@ -99,6 +130,10 @@ class ChatbotInteraction(Base):
     timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     user = relationship("UserDB")
 
+    __table_args__ = (
+        Index("ix_chatbot_interactions_user_history", "user_id", "id"),
+    )
+
 class ParcelleNote(Base):
     __tablename__ = "parcelle_notes"
 
@@ -143,23 +178,107 @@ class ParcelleNoteFormattedResponse(BaseModel):
 
     class Config:
         orm_mode = True
+# Colonnes lues par les listes : pas d'objets ORM hydratés, seulement des tuples
+PARCELLE_COLUMNS = (
+    ParcelleNote.id, ParcelleNote.image_url, ParcelleNote.nom_ferme, ParcelleNote.numero_parcelle,
+    ParcelleNote.superficie, ParcelleNote.type_sol, ParcelleNote.culture, ParcelleNote.date_semis,
+    ParcelleNote.quantite_semence, ParcelleNote.systeme_irrigation, ParcelleNote.suivi_culture,
+    ParcelleNote.date_recolte, ParcelleNote.nombre_travailleurs, ParcelleNote.depenses,
+    ParcelleNote.rendement, ParcelleNote.autres_infos, ParcelleNote.date_creation,
+)
+
+
+def parcelle_fields(parcelle) -> dict:
+    """Champs formatés d'une parcelle (objet ORM ou ligne PARCELLE_COLUMNS), prêts pour la réponse JSON."""
+    return {
+        "id": parcelle.id,
+        "image_url": parcelle.image_url,
+        "nom_ferme": parcelle.nom_ferme,
+        "numero_parcelle": parcelle.numero_parcelle,
+        "superficie": f"{parcelle.superficie} hectares",
+        "type_sol": parcelle.type_sol,
+        "culture": parcelle.culture,
+        "date_semis": parcelle.date_semis,
+        "quantite_semence": f"{parcelle.quantite_semence} kg/hectare",
+        "systeme_irrigation": parcelle.systeme_irrigation,
+        "suivi_culture": parcelle.suivi_culture,
+        "date_recolte": parcelle.date_recolte,
+        "nombre_travailleurs": f"{parcelle.nombre_travailleurs} personnes",
+        "depenses": parcelle.depenses,
+        "rendement": f"{parcelle.rendement} tonnes/hectare",
+        "autres_infos": parcelle.autres_infos,
+        "date_creation": parcelle.date_creation,
+    }
+
+
 def format_parcelle(parcelle: ParcelleNote) -> ParcelleNoteFormattedResponse:
-    return ParcelleNoteFormattedResponse(
-        id=parcelle.id,
-        image_url=parcelle.image_url,
-        nom_ferme=parcelle.nom_ferme,
-        numero_parcelle=parcelle.numero_parcelle,
-        superficie=f"{parcelle.superficie} hectares",
-        type_sol=parcelle.type_sol,
-        culture=parcelle.culture,
-        date_semis=parcelle.date_semis,
-        quantite_semence=f"{parcelle.quantite_semence} kg/hectare",
-        systeme_irrigation=parcelle.systeme_irrigation,
-        suivi_culture=parcelle.suivi_culture,
-        date_recolte=parcelle.date_recolte,
-        nombre_travailleurs=f"{parcelle.nombre_travailleurs} personnes",
-        depenses=parcelle.depenses,
-        rendement=f"{parcelle.rendement} tonnes/hectare",
-        autres_infos=parcelle.autres_infos,
-        date_creation=parcelle.date_creation
+    return ParcelleNoteFormattedResponse(**parcelle_fields(parcelle))
+
+
+# ✅ Données de référence (importées par `python -m DB.import_reference`)
+class ReferenceImport(Base):
+    """Dernier import de chaque jeu de référence : sert de version pour les caches des workers."""
+    __tablename__ = "ref_imports"
+
+    name = Column(String, primary_key=True)  # traitements, besoins_irrigation, catalogues
+    sha256 = Column(String, nullable=False)  # hash du fichier source importé
+    rows = Column(Integer, nullable=False)
+    imported_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+
+class TreatmentReference(Base):
+    __tablename__ = "ref_traitements"
+
+    id = Column(Integer, primary_key=True)
+    position = Column(Integer, nullable=False)  # ordre du fichier source (le premier traitement l'emporte)
+    plant_key = Column(String, nullable=False)
+    disease_key = Column(String, nullable=False)
+    gravite = Column(String, nullable=True)
+    stade = Column(String, nullable=True)
+    dar = Column(String, nullable=True)
+    matiere_active = Column(String, nullable=True)
+    entry = Column(JSON, nullable=False)  # entrée d'origine, renvoyée telle quelle par l'API
+
+    __table_args__ = (
+        Index("ix_ref_traitements_criteres", "plant_key", "disease_key", "gravite", "stade", "dar"),
+    )
+
+
+class IrrigationNeedReference(Base):
+    __tablename__ = "ref_besoins_irrigation"
+
+    id = Column(Integer, primary_key=True)
+    culture = Column(String, nullable=False)
+    type_sol = Column(String, nullable=False)
+    saison = Column(String, nullable=False)
+    culture_key = Column(String, nullable=False)
+    type_sol_key = Column(String, nullable=False)
+    saison_key = Column(String, nullable=False)
+    frequence_irrigation = Column(Integer, nullable=False)  # séances par semaine
+    besoin_quotidien = Column(Float, nullable=False)  # m³/ha/jour
+
+    __table_args__ = (
+        UniqueConstraint("culture_key", "type_sol_key", "saison_key", name="uq_ref_besoins_irrigation_cle"),
     )
+
+
+class CatalogueReference(Base):
+    __tablename__ = "ref_catalogues"
+
+    id = Column(Integer, primary_key=True)
+    nom = Column(String, nullable=False)
+    nom_key = Column(String, unique=True, nullable=False)
+    liens_sites = Column(JSON, nullable=False, default=list)
+    produits = relationship("ProduitReference", order_by="ProduitReference.position")
+
+
+class ProduitReference(Base):
+    __tablename__ = "ref_produits"
+
+    id = Column(Integer, primary_key=True)
+    catalogue_id = Column(Integer, ForeignKey("ref_catalogues.id", ondelete="CASCADE"), index=True, nullable=False)
+    position = Column(Integer, nullable=False)
+    nom = Column(String, nullable=False)
+    description = Column(Text, nullable=True)
+    image = Column(String, nullable=True)
+
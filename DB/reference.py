@@ -0,0 +1,68 @@
+import threading
+import time
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+
+from config import env
+from DB.database import SessionLocal
+from DB.models import ReferenceImport
+
+# Délai entre deux vérifications de la version importée (un SELECT par clé primaire)
+REFERENCE_VERSION_TTL = float(env("REFERENCE_VERSION_TTL", 30))
+
+
+def reference_key(value) -> str:
+    """Clé de recherche plante / maladie / catalogue (même règle que les anciennes comparaisons strip().lower())."""
+    return str(value).strip().casefold()
+
+
+class ReferenceCache:
+    """
+    Jeu de référence (table ref_*) chargé en entier par `loader(db)` dans chaque worker, puis servi
+    depuis la mémoire : les recherches ne touchent jamais la base et une clé inconnue n'ajoute rien
+    au cache (la mémoire ne dépend que de la taille du jeu, pas des requêtes reçues).
+    Rechargé dès qu'un nouvel import est détecté dans ref_imports.
+    """
+
+    def __init__(self, name: str, loader, ttl: float = REFERENCE_VERSION_TTL):
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._version = None
+        self._value = None
+        self._checked_at = float("-inf")
+
+    def _fresh(self) -> bool:
+        return time.monotonic() - self._checked_at < self.ttl
+
+    def refresh(self):
+        """Vérifie la version importée et recharge le jeu s'il a changé (requêtes SQL bloquantes)."""
+        with self._lock:
+            if self._fresh():
+                return
+            with SessionLocal() as db:
+                version = db.scalar(select(ReferenceImport.sha256).where(ReferenceImport.name == self.name))
+                if self._value is None or version != self._version:
+                    self._value = self.loader(db)
+                    self._version = version
+            # Jeu pas encore importé : la version est revérifiée à chaque appel
+            self._checked_at = time.monotonic() if version is not None else float("-inf")
+
+    def get(self):
+        """Jeu courant, depuis du code synchrone (handler `def`, CLI)."""
+        if not self._fresh():
+            self.refresh()
+        return self._value
+
+    async def get_async(self):
+        """Jeu courant, depuis un handler async : vérification et rechargement passent par le threadpool."""
+        if not self._fresh():
+            await run_in_threadpool(self.refresh)
+        return self._value
+
+    def invalidate(self):
+        with self._lock:
+            self._value = None
+            self._checked_at = float("-inf")
@@ -1,8 +1,39 @@
 import json
+import unicodedata
+from datetime import date
 from pathlib import Path
 
+import numpy as np
+from sqlalchemy import select
+
+from config import env
+from DB.models import IrrigationNeedReference
+from DB.reference import ReferenceCache
+
 JSON_PATH = Path(__file__).parent / "data" / "BesoinNet.json"
 
+# Efficience de chaque système : besoin brut = besoin net / efficience
+EFFICIENCES = {
+    "goutte_a_goutte": 0.90,
+    "aspersion": 0.70,
+    "gravitaire": 0.50,
+}
+
+# 1 mm de pluie = 10 m³/ha ; seule une partie de la pluie est utile à la culture
+M3_HA_PAR_MM = 10.0
+PLUIE_EFFICACE = float(env("IRRIGATION_PLUIE_EFFICACE", 0.8))
+
+
+class IrrigationLookupError(ValueError):
+    """Combinaison culture / sol / saison ou type d'irrigation inconnu."""
+
+
+def normalize(value: str) -> str:
+    """Clé insensible à la casse, aux accents et aux espaces superflus ("Été " -> "ete")."""
+    decomposed = unicodedata.normalize("NFKD", str(value))
+    without_accents = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(without_accents.replace("_", " ").split()).casefold()
+
 
 def load_irrigation_data():
     if not JSON_PATH.exists():
@@ -11,42 +42,74 @@ def load_irrigation_data():
         return json.load(f)
 
 
-def calculate_irrigation(culture: str, type_sol: str, saison: str, type_irrigation: str):
-    try:
-        data = load_irrigation_data()
-        print("✅ Fichier JSON chargé avec succès")
-        print("👉 Exemple d’entrée chargée :", data[0])
+class IrrigationTable:
+    """
+    Besoins nets lus dans la table ref_besoins_irrigation (voir `python -m DB.import_reference`),
+    chargés en entier par worker et indexés par (culture, type_sol, saison) normalisés.
+    Rechargés au prochain import.
+    """
+
+    def __init__(self):
+        self._cache = ReferenceCache("besoins_irrigation", self._load)
+
+    @staticmethod
+    def _entry(row):
+        return {
+            "Culture": row.culture,
+            "Type de sol": row.type_sol,
+            "Saison": row.saison,
+            "Fréquence d'irrigation (par semaine)": row.frequence_irrigation,
+            "Besoin quotidien (m³/ha/jour)": row.besoin_quotidien,
+        }
+
+    @classmethod
+    def _load(cls, db) -> dict:
+        rows = db.scalars(select(IrrigationNeedReference)).all()
+        return {
+            "besoins": {(r.culture_key, r.type_sol_key, r.saison_key): cls._entry(r) for r in rows},
+            "options": {
+                "cultures": sorted({r.culture for r in rows}),
+                "types_sol": sorted({r.type_sol for r in rows}),
+                "saisons": sorted({r.saison for r in rows}),
+                "types_irrigation": list(EFFICIENCES),
+            },
+        }
+
+    async def lookup(self, culture: str, type_sol: str, saison: str):
+        table = await self._cache.get_async()
+        return table["besoins"].get((normalize(culture), normalize(type_sol), normalize(saison)))
+
+    async def options(self) -> dict:
+        return (await self._cache.get_async())["options"]
 
-        entry = next(
-            (item for item in data
-             if item["Culture"] == culture
-             and item["Type de sol"] == type_sol
-             and item["Saison"] == saison),
-            None
-        )
 
+irrigation_table = IrrigationTable()
 
+
+async def calculate_irrigation(culture: str, type_sol: str, saison: str, type_irrigation: str):
+    try:
+        entry = await irrigation_table.lookup(culture, type_sol, saison)
         if not entry:
-            raise ValueError(f"Combinaison non trouvée pour: Culture={culture}, Type de sol={type_sol}, Saison={saison}")
+            raise IrrigationLookupError(
+                f"Combinaison non trouvée pour: Culture={culture}, Type de sol={type_sol}, Saison={saison}"
+            )
+
+        type_irrigation = normalize(type_irrigation).replace(" ", "_")
+        efficience = EFFICIENCES.get(type_irrigation)
+        if efficience is None:
+            raise IrrigationLookupError("Type d'irrigation invalide.")
 
         besoin_quotidien = entry["Besoin quotidien (m³/ha/jour)"]
         frequence = entry["Fréquence d'irrigation (par semaine)"]
 
-        if type_irrigation == "goutte_a_goutte":
-            besoin_brut = besoin_quotidien / 0.90
-        elif type_irrigation == "aspersion":
-            besoin_brut = besoin_quotidien / 0.70
-        elif type_irrigation == "gravitaire":
-            besoin_brut = besoin_quotidien / 0.50
-        else:
-            raise ValueError("Type d'irrigation invalide.")
-
+        besoin_brut = besoin_quotidien / efficience
         besoin_par_seance = (besoin_brut * 7) / frequence
 
+        # Valeurs canoniques du fichier, quelle que soit la graphie reçue
         return {
-            "culture": culture,
-            "type_sol": type_sol,
-            "saison": saison,
+            "culture": entry["Culture"],
+            "type_sol": entry["Type de sol"],
+            "saison": entry["Saison"],
             "type_irrigation": type_irrigation,
             "frequence_irrigation": frequence,
             "besoin_brut": besoin_brut,
@@ -54,10 +117,79 @@ def calculate_irrigation(culture: str, type_sol: str, saison: str, type_irrigati
             "irrigation_necessaire": True
         }
 
-
+    except IrrigationLookupError:
+        raise
     except FileNotFoundError as e:
         raise ValueError(f"Erreur de fichier : {str(e)}")
     except KeyError as e:
         raise ValueError(f"Clé manquante dans le fichier JSON : {str(e)}")
     except Exception as e:
         raise ValueError(f"Erreur lors du calcul de l'irrigation : {str(e)}")
+
+
+def saison_courante(today: date = None) -> str:
+    mois = (today or date.today()).month
+    if mois in (3, 4, 5):
+        return "printemps"
+    if mois in (6, 7, 8):
+        return "été"
+    if mois in (9, 10, 11):
+        return "automne"
+    return "hiver"
+
+
+async def calculate_irrigation_many(items: list):
+    """
+    Version vectorisée de calculate_irrigation pour une liste de parcelles
+    (clés culture, type_sol, saison, type_irrigation, superficie en ha).
+    Renvoie (résultats, erreurs) ; les erreurs sont indexées comme `items`.
+    """
+    valid, errors = [], []
+    besoins, frequences, efficiences, superficies = [], [], [], []
+    for i, item in enumerate(items):
+        entry = await irrigation_table.lookup(item["culture"], item["type_sol"], item["saison"])
+        type_irrigation = normalize(item["type_irrigation"]).replace(" ", "_")
+        if not entry:
+            errors.append({"index": i, "detail": (
+                f"Combinaison non trouvée pour: Culture={item['culture']}, "
+                f"Type de sol={item['type_sol']}, Saison={item['saison']}")})
+            continue
+        if type_irrigation not in EFFICIENCES:
+            errors.append({"index": i, "detail": "Type d'irrigation invalide."})
+            continue
+        valid.append((i, entry, type_irrigation))
+        besoins.append(entry["Besoin quotidien (m³/ha/jour)"])
+        frequences.append(entry["Fréquence d'irrigation (par semaine)"])
+        efficiences.append(EFFICIENCES[type_irrigation])
+        superficies.append(item.get("superficie") or 0.0)
+
+    besoin_brut = np.asarray(besoins, dtype=float) / np.asarray(efficiences, dtype=float)
+    besoin_par_seance = besoin_brut * 7 / np.asarray(frequences, dtype=float)
+    volume_jour = besoin_brut * np.asarray(superficies, dtype=float)
+
+    results = []
+    for k, (i, entry, type_irrigation) in enumerate(valid):
+        results.append({
+            "index": i,
+            "culture": entry["Culture"],
+            "type_sol": entry["Type de sol"],
+            "saison": entry["Saison"],
+            "type_irrigation": type_irrigation,
+            "frequence_irrigation": frequences[k],
+            "besoin_brut": float(besoin_brut[k]),
+            "besoin_par_seance": float(besoin_par_seance[k]),
+            "superficie": superficies[k],
+            "volume_m3_jour": float(volume_jour[k]),
+            "volume_m3_semaine": float(volume_jour[k] * 7),
+            "irrigation_necessaire": True
+        })
+    return results, errors
+
+
+def pluie_efficace_m3_ha(pluie_mm: float) -> float:
+    return pluie_mm * M3_HA_PAR_MM * PLUIE_EFFICACE
+
+
+def irrigation_necessaire(besoin_par_seance: float, pluie_mm: float) -> bool:
+    """Irrigation nécessaire si la pluie efficace prévue ne couvre pas une séance."""
+    return pluie_efficace_m3_ha(pluie_mm) < (besoin_par_seance or 0.0)
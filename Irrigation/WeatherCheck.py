@@ -1,35 +1,162 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
 import httpx
 from config import env
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
 
 OPENWEATHER_API_KEY = env("OPENWEATHER_API_KEY")
-LATITUDE = "32.33"
-LONGITUDE = "-6.35"
+# Surchargable pour pointer vers un serveur local (stub) en test
+OPENWEATHER_BASE_URL = env("OPENWEATHER_BASE_URL", "https://api.openweathermap.org")
+LATITUDE = float(env("DEFAULT_LATITUDE", 32.33))
+LONGITUDE = float(env("DEFAULT_LONGITUDE", -6.35))
+
+# Taille de la maille (en degrés) : les parcelles d'une même maille partagent la même prévision
+WEATHER_GRID_DEG = float(env("WEATHER_GRID_DEG", 0.1))
+WEATHER_TTL = float(env("WEATHER_TTL", 30 * 60))
+# Au-delà du TTL, une prévision reste servie (et rafraîchie en arrière-plan) jusqu'à cet âge
+WEATHER_STALE_TTL = float(env("WEATHER_STALE_TTL", 6 * 3600))
+# Nombre maximal de mailles gardées en mémoire (les moins récemment lues sont évincées)
+WEATHER_CACHE_SIZE = int(env("WEATHER_CACHE_SIZE", 4096))
+WEATHER_STALE_WHILE_REVALIDATE = env("WEATHER_STALE_WHILE_REVALIDATE", "true").lower() in ("1", "true", "yes")
 
 
-def check_weather_before_irrigation():
+def rain_next_24h(forecast: dict) -> float:
+    rain_total = 0.0
+    # Prendre les 8 premières prévisions (chaque 3h = 24h)
+    for item in forecast.get("list", [])[:8]:
+        if "rain" in item and "3h" in item["rain"]:
+            rain_total += item["rain"]["3h"]
+    return rain_total
+
+
+class WeatherService:
     """
-    Fonction SYNCHRONE pour récupérer la quantité de pluie prévue dans les 24 prochaines heures.
-    Utilisée par le scheduler pour les notifications.
+    Prévisions OpenWeather asynchrones, mises en cache par maille lat/lon arrondie.
+    - un seul client httpx.AsyncClient (connexions keep-alive réutilisées) ;
+    - les requêtes concurrentes sur une même maille partagent un seul appel amont ;
+    - stale-while-revalidate : une prévision expirée est servie pendant son rafraîchissement.
     """
-    url = f"https://api.openweathermap.org/data/2.5/forecast?lat={LATITUDE}&lon={LONGITUDE}&appid={OPENWEATHER_API_KEY}&units=metric"
 
-    try:
-        response = httpx.get(url)
-        if response.status_code != 200:
-            return 0
+    def __init__(self, base_url: str = OPENWEATHER_BASE_URL, api_key: str = OPENWEATHER_API_KEY,
+                 ttl: float = WEATHER_TTL, stale_ttl: float = WEATHER_STALE_TTL,
+                 grid: float = WEATHER_GRID_DEG, stale_while_revalidate: bool = WEATHER_STALE_WHILE_REVALIDATE,
+                 max_size: int = WEATHER_CACHE_SIZE):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.grid = grid
+        self.stale_while_revalidate = stale_while_revalidate
+        self.max_size = max_size
+        self._client = None
+        self._cache = OrderedDict()  # maille -> (prévision, date de récupération), ordre LRU
+        self._inflight = {}  # maille -> tâche de récupération en cours
+        self.upstream_calls = metrics.counter("weather_upstream_calls")
+        self.upstream_errors = metrics.counter("weather_upstream_errors")
+        self.cache_hits = metrics.counter("weather_cache_hits")
+        self.stale_hits = metrics.counter("weather_cache_stale_hits")
 
-        data = response.json()
-        rain_total = 0.0
+    def cell(self, lat: float, lon: float) -> tuple:
+        return round(round(lat / self.grid) * self.grid, 4), round(round(lon / self.grid) * self.grid, 4)
 
-        # Prendre les 8 premières prévisions (chaque 3h = 24h)
-        for forecast in data["list"][:8]:
-            if "rain" in forecast and "3h" in forecast["rain"]:
-                rain_total += forecast["rain"]["3h"]
+    def cell_key(self, lat: float, lon: float) -> str:
+        """Identifiant texte de la maille, stocké avec les recommandations d'irrigation."""
+        cell_lat, cell_lon = self.cell(lat, lon)
+        return f"{cell_lat:.4f},{cell_lon:.4f}"
 
-        return rain_total
+    @staticmethod
+    def parse_cell_key(key: str) -> tuple:
+        lat, lon = key.split(",")
+        return float(lat), float(lon)
 
-    except Exception as e:
-        print(f"Erreur lors de la récupération de la météo : {e}")
-        return 0
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(10.0, connect=5.0),
+                limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _fetch(self, cell: tuple) -> dict:
+        self.upstream_calls.inc()
+        try:
+            response = await self.client().get("/data/2.5/forecast", params={
+                "lat": cell[0], "lon": cell[1], "appid": self.api_key, "units": "metric"
+            })
+            response.raise_for_status()
+            forecast = response.json()
+        except Exception:
+            self.upstream_errors.inc()
+            raise
+        self._cache[cell] = (forecast, time.monotonic())
+        self._cache.move_to_end(cell)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+        return forecast
+
+    def _refresh(self, cell: tuple) -> asyncio.Task:
+        """Une seule récupération amont par maille, partagée par tous les appelants."""
+        task = self._inflight.get(cell)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._fetch(cell))
+            self._inflight[cell] = task
+            task.add_done_callback(lambda t: self._on_refreshed(cell, t))
+        return task
 
+    def _on_refreshed(self, cell: tuple, task: asyncio.Task):
+        self._inflight.pop(cell, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Erreur lors de la récupération de la météo %s : %s", cell, task.exception())
 
+    async def get_forecast(self, lat: float, lon: float) -> dict:
+        cell = self.cell(lat, lon)
+        cached = self._cache.get(cell)
+        if cached is not None:
+            self._cache.move_to_end(cell)
+            forecast, fetched_at = cached
+            age = time.monotonic() - fetched_at
+            if age < self.ttl:
+                self.cache_hits.inc()
+                return forecast
+            if self.stale_while_revalidate and age < self.stale_ttl:
+                self.stale_hits.inc()
+                self._refresh(cell)
+                return forecast
+
+        try:
+            # shield : l'annulation d'un appelant n'annule pas la récupération partagée
+            return await asyncio.shield(self._refresh(cell))
+        except Exception:
+            if cached is not None and time.monotonic() - cached[1] < self.stale_ttl:
+                return cached[0]
+            raise
+
+    async def rain_next_24h(self, lat: float, lon: float) -> float:
+        return rain_next_24h(await self.get_forecast(lat, lon))
+
+
+# Instance partagée par tous les handlers du worker
+weather_service = WeatherService()
+
+
+async def check_weather_before_irrigation(lat: float = LATITUDE, lon: float = LONGITUDE):
+    """
+    Quantité de pluie prévue dans les 24 prochaines heures (mm) sur la maille de (lat, lon).
+    Renvoie 0 si la météo est indisponible.
+    """
+    try:
+        return await weather_service.rain_next_24h(lat, lon)
+    except Exception as e:
+        logger.warning("Erreur lors de la récupération de la météo : %s", e)
+        return 0
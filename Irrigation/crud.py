@@ -1,9 +1,23 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from DB.models import IrrigationRecord
+from Irrigation.WeatherCheck import weather_service, LATITUDE, LONGITUDE
 from datetime import datetime
 import pytz
 
-def create_irrigation_record(db: Session, data: dict):
+
+def _location(data: dict) -> dict:
+    latitude = data.get("latitude")
+    longitude = data.get("longitude")
+    if latitude is None or longitude is None:
+        latitude, longitude = LATITUDE, LONGITUDE
+    return {
+        "latitude": latitude,
+        "longitude": longitude,
+        "weather_cell": weather_service.cell_key(latitude, longitude),
+    }
+
+async def create_irrigation_record(db: AsyncSession, data: dict):
     record = IrrigationRecord(
         culture=data["culture"],
         type_sol=data["type_sol"],
@@ -14,15 +28,43 @@ def create_irrigation_record(db: Session, data: dict):
         besoin_par_seance=data["besoin_par_seance"],
         irrigation_necessaire=data.get("irrigation_necessaire", True),
         timestamp=datetime.now(pytz.utc),
-        user_id = data["user_id"]
+        user_id = data["user_id"],
+        **_location(data)
     )
     db.add(record)
-    db.commit()
-    db.refresh(record)
+    await db.commit()
     return record
 
-def get_all_records(db: Session):
-    return db.query(IrrigationRecord).all()
+async def create_irrigation_records(db: AsyncSession, rows: list) -> list:
+    """Insère toutes les recommandations en un seul INSERT groupé et une seule transaction."""
+    if not rows:
+        return []
+    now = datetime.now(pytz.utc)
+    values = [
+        {
+            "culture": data["culture"],
+            "type_sol": data["type_sol"],
+            "saison": data["saison"],
+            "type_irrigation": data["type_irrigation"],
+            "frequence_irrigation": data["frequence_irrigation"],
+            "besoin_brut": data["besoin_brut"],
+            "besoin_par_seance": data["besoin_par_seance"],
+            "irrigation_necessaire": data.get("irrigation_necessaire", True),
+            "timestamp": now,
+            "user_id": data["user_id"],
+            **_location(data),
+        }
+        for data in rows
+    ]
+    # Ids dans l'ordre des lignes envoyées : l'appelant les associe aux parcelles par position
+    ids = (await db.scalars(
+        insert(IrrigationRecord).returning(IrrigationRecord.id, sort_by_parameter_order=True), values
+    )).all()
+    await db.commit()
+    return ids
+
+async def get_all_records(db: AsyncSession):
+    return (await db.scalars(select(IrrigationRecord))).all()
 
-def get_record_by_id(db: Session, record_id: int):
-    return db.query(IrrigationRecord).filter(IrrigationRecord.id == record_id).first()
+async def get_record_by_id(db: AsyncSession, record_id: int):
+    return await db.get(IrrigationRecord, record_id)
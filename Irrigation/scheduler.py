@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+
+from sqlalchemy import or_, select, update
+from starlette.concurrency import run_in_threadpool
+
+from config import env
+from DB.database import SessionLocal
+from DB.locks import acquire_lock, release_lock, utcnow
+from DB.models import IrrigationRecord
+from Irrigation.IrrigationLogic import pluie_efficace_m3_ha
+from Irrigation.WeatherCheck import weather_service, LATITUDE, LONGITUDE
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_ENABLED = env("IRRIGATION_SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+SCHEDULER_INTERVAL = float(env("IRRIGATION_SCHEDULER_INTERVAL", 30 * 60))
+LOCK_NAME = "irrigation_weather_refresh"
+
+
+def weather_cells() -> list:
+    """Mailles météo distinctes des recommandations (les anciennes lignes sans maille sont rattachées à la position par défaut)."""
+    with SessionLocal() as db:
+        db.execute(
+            update(IrrigationRecord)
+            .where(IrrigationRecord.weather_cell.is_(None))
+            .values(latitude=LATITUDE, longitude=LONGITUDE,
+                    weather_cell=weather_service.cell_key(LATITUDE, LONGITUDE))
+        )
+        db.commit()
+        return db.scalars(select(IrrigationRecord.weather_cell).distinct()).all()
+
+
+def apply_forecast(cell: str, pluie_mm: float) -> int:
+    """
+    Met à jour la décision des seules recommandations de la maille dont la pluie prévue a changé.
+    Un UPDATE par maille, sur l'index weather_cell ; renvoie le nombre de lignes modifiées.
+    """
+    with SessionLocal() as db:
+        updated = db.execute(
+            update(IrrigationRecord)
+            .where(IrrigationRecord.weather_cell == cell)
+            .where(or_(IrrigationRecord.pluie_prevue_mm.is_(None), IrrigationRecord.pluie_prevue_mm != pluie_mm))
+            .values(
+                pluie_prevue_mm=pluie_mm,
+                irrigation_necessaire=IrrigationRecord.besoin_par_seance > pluie_efficace_m3_ha(pluie_mm),
+                meteo_updated_at=utcnow(),
+            )
+        ).rowcount
+        db.commit()
+        return updated
+
+
+class IrrigationScheduler:
+    """
+    Tâche asyncio de fond : à chaque intervalle, rafraîchit les prévisions de chaque maille
+    et recalcule `irrigation_necessaire` des recommandations concernées.
+    Entre plusieurs workers gunicorn, un bail en base (scheduler_locks) garantit qu'un seul
+    worker fait le travail ; les autres restent en attente et prennent le relais s'il disparaît.
+    """
+
+    def __init__(self, interval: float = SCHEDULER_INTERVAL, lock_name: str = LOCK_NAME):
+        self.interval = interval
+        self.lock_name = lock_name
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._task = None
+        self.runs = metrics.counter("irrigation_scheduler_runs")
+        self.updated_records = metrics.counter("irrigation_scheduler_updated_records")
+        self.run_hist = metrics.histogram(
+            "irrigation_scheduler_run_seconds", [0.1, 0.5, 1, 2.5, 5, 10, 30, 60]
+        )
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            await run_in_threadpool(release_lock, self.lock_name, self.owner)
+
+    async def _loop(self):
+        while True:
+            try:
+                # Bail de deux intervalles : expire si ce worker meurt sans le libérer
+                if await run_in_threadpool(acquire_lock, self.lock_name, self.owner, 2 * self.interval):
+                    await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Échec du rafraîchissement météo des irrigations")
+            await asyncio.sleep(self.interval)
+
+    async def _refresh_cell(self, cell: str) -> int:
+        lat, lon = weather_service.parse_cell_key(cell)
+        try:
+            pluie_mm = await weather_service.rain_next_24h(lat, lon)
+        except Exception as e:
+            # Météo indisponible : on garde la dernière décision connue
+            logger.warning("Météo indisponible pour la maille %s : %s", cell, e)
+            return 0
+        return await run_in_threadpool(apply_forecast, cell, pluie_mm)
+
+    async def run_once(self) -> int:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        cells = await run_in_threadpool(weather_cells)
+        updated = sum(await asyncio.gather(*(self._refresh_cell(cell) for cell in cells)))
+        self.runs.inc()
+        self.updated_records.inc(updated)
+        self.run_hist.observe(loop.time() - start)
+        logger.info("Irrigation : %d maille(s) météo, %d recommandation(s) mise(s) à jour", len(cells), updated)
+        return updated
+
+
+irrigation_scheduler = IrrigationScheduler()
@@ -1,11 +1,14 @@
 from pydantic import BaseModel, validator
 from datetime import datetime
+from typing import List, Optional
 
 class IrrigationInput(BaseModel):
     culture: str
     type_sol: str
     saison: str
     type_irrigation: str
+    latitude: Optional[float] = None  # par défaut : position par défaut de l'exploitation
+    longitude: Optional[float] = None
 
 class IrrigationOutput(BaseModel):
     id: int
@@ -17,6 +20,7 @@ class IrrigationOutput(BaseModel):
     besoin_brut: str       # formaté avec unité
     besoin_par_seance: str # formaté avec unité
     irrigation_necessaire: bool
+    pluie_prevue_mm: Optional[float] = None
     timestamp: datetime
 
     @validator("besoin_brut", "besoin_par_seance", pre=True)
@@ -29,3 +33,22 @@ class IrrigationOutput(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class ParcelIrrigationInput(BaseModel):
+    parcelle_id: Optional[int] = None
+    nom: Optional[str] = None
+    culture: str
+    type_sol: str
+    type_irrigation: str
+    saison: Optional[str] = None  # par défaut : saison du plan
+    superficie: float = 1.0  # hectares
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+
+class IrrigationPlanInput(BaseModel):
+    saison: Optional[str] = None  # par défaut : saison courante
+    parcelles: Optional[List[ParcelIrrigationInput]] = None  # par défaut : toutes les parcelles de l'utilisateur
+    enregistrer: bool = True
+
@@ -1,5 +1,6 @@
 from fastapi import FastAPI, Form, Depends, Query, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy.orm import Session
 from datetime import datetime
@@ -8,7 +9,7 @@ from typing import Optional, List
 import os
 from endpoint.mainIrrig import router as irrigation_router
 from DB.database import Base, engine
-from DB.database import engine, SessionLocal, get_session
+from DB.database import engine, async_engine, SessionLocal, get_session
 from security import get_current_user, validate_tel
 from fastapi import FastAPI
 from pydantic import BaseModel
@@ -23,7 +24,13 @@ from endpoint.recommanded import router as recommanded_router
 from endpoint.ParcelleNote import router as parcelle_router
 from endpoint import Catalogue
 
-from Irrigation.WeatherCheck import check_weather_before_irrigation
+from Irrigation.WeatherCheck import check_weather_before_irrigation, weather_service
+from ai.registry import registry
+from ai.DetecMaladie.batching import disease_batcher
+from metrics import metrics
+from weather_proxy import weather_proxy
+from Irrigation.scheduler import irrigation_scheduler, SCHEDULER_ENABLED
+from DB.import_reference import import_missing_reference_data
 
 
 # ✅ Créer les tables
@@ -31,7 +38,8 @@ Base.metadata.create_all(bind=engine)
 
 
 # ✅ Initialisation de l'app (une seule fois !)
-app = FastAPI()
+# orjson pour toutes les réponses JSON (dates, listes longues : rendu bien plus rapide que json)
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # ✅ CORS Middleware
 app.add_middleware(
@@ -51,6 +59,43 @@ app.include_router(parcelle_router, prefix="/parcelles", tags=["Parcelles"])
 app.include_router(Catalogue.router, prefix="/api", tags=["Catalogue Agricole"])
 
 
+# ✅ Chargement + warm-up des modèles avant que le worker n'accepte du trafic
+@app.on_event("startup")
+def warm_up_models():
+    import_missing_reference_data()
+    registry.warm_up()
+    disease_batcher.start()
+    weather_proxy.start()
+    if SCHEDULER_ENABLED:
+        irrigation_scheduler.start()
+
+
+@app.on_event("shutdown")
+async def stop_batchers():
+    await disease_batcher.stop()
+    await irrigation_scheduler.stop()
+    await weather_service.close()
+    await weather_proxy.close()
+    await async_engine.dispose()
+
+
+@app.get("/health/live", tags=["Health"])
+def liveness():
+    return {"status": "ok"}
+
+
+@app.get("/health/ready", tags=["Health"])
+def readiness():
+    if not registry.is_ready():
+        raise HTTPException(status_code=503, detail="Modèles en cours de chargement")
+    return registry.status()
+
+
+@app.get("/metrics", tags=["Health"])
+def get_metrics():
+    return metrics.snapshot()
+
+
 # ✅ Statics
 AUDIO_FOLDER = os.path.abspath("audio_responses")
 USER_IMAGES_FOLDER = os.path.abspath("user_images")
@@ -67,27 +112,21 @@ app.mount("/user_images", StaticFiles(directory=USER_IMAGES_FOLDER), name="user_
 app.mount("/plant_images", StaticFiles(directory=PLANT_IMAGES_FOLDER), name="plant_images")
 app.mount("/uploads", StaticFiles(directory=UPLOADS_FOLDER), name="uploads")
 app.mount("/storage", StaticFiles(directory="storage"), name="storage")
-WEATHER_API_URL = "http://api.weatherapi.com/v1/current.json"
-
 @app.get("/weather/current.json")
 async def get_current_weather(
     key: str = Query(...),
     q: str = Query(...),
     aqi: str = Query("no")
 ):
-    params = {
-        "key": key,
-        "q": q,
-        "aqi": aqi
-    }
-
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(WEATHER_API_URL, params=params)
+    try:
+        status_code, payload = await weather_proxy.get(key, q, aqi)
+    except httpx.HTTPError:
+        raise HTTPException(status_code=502, detail="Weather API unreachable")
 
-    if resp.status_code != 200:
-        raise HTTPException(status_code=resp.status_code, detail="Weather API error")
+    if status_code != 200:
+        raise HTTPException(status_code=status_code, detail="Weather API error")
 
-    return resp.json()
+    return payload
 GOOGLE_TRANSLATE_API_KEY = "YOUR_GOOGLE_API_KEY"
 
 class TranslationRequest(BaseModel):
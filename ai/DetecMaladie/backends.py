@@ -0,0 +1,84 @@
+"""
+Backends d'inférence CPU pour ResNet9.
+
+- eager       : modèle PyTorch float32 tel quel (référence)
+- torchscript : module tracé puis gelé (torch.jit.freeze + optimize_for_inference)
+- compile     : torch.compile (inductor)
+- int8        : quantification statique int8 (FX graph mode) des blocs de convolution,
+                calibrée sur des images réelles
+"""
+import logging
+from pathlib import Path
+
+import torch
+import torch.nn as nn
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("eager", "torchscript", "compile", "int8")
+
+
+def configure_threads(num_threads: int):
+    if num_threads and num_threads > 0:
+        torch.set_num_threads(num_threads)
+        logger.info("torch.set_num_threads(%d)", num_threads)
+
+
+def load_calibration_batch(directory, transform, limit: int = 32) -> torch.Tensor:
+    """Charge jusqu'à `limit` images du dossier ; tenseur aléatoire si le dossier est vide."""
+    tensors = []
+    for path in sorted(Path(directory).glob("*")):
+        if len(tensors) >= limit:
+            break
+        if path.suffix.lower() not in (".jpg", ".jpeg", ".png"):
+            continue
+        try:
+            tensors.append(transform(Image.open(path).convert("RGB")))
+        except Exception as e:
+            logger.warning("Image de calibration ignorée %s : %s", path, e)
+    if not tensors:
+        logger.warning("Aucune image de calibration dans %s, utilisation de données aléatoires", directory)
+        return torch.rand(8, 3, 256, 256)
+    return torch.stack(tensors)
+
+
+def _quantize_int8(model: nn.Module, calibration: torch.Tensor) -> nn.Module:
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    engine = "x86" if "x86" in torch.backends.quantized.supported_engines else "fbgemm"
+    torch.backends.quantized.engine = engine
+    prepared = prepare_fx(model, get_default_qconfig_mapping(engine), (calibration[:1],))
+    with torch.no_grad():
+        for chunk in calibration.split(8):
+            prepared(chunk)
+    return convert_fx(prepared)
+
+
+def build_backend(model: nn.Module, backend: str, image_size, channels_last: bool = False,
+                  calibration: torch.Tensor = None) -> nn.Module:
+    """Transforme un ResNet9 eager (déjà en mode eval) selon le backend demandé."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend inconnu : {backend} (valeurs possibles : {', '.join(BACKENDS)})")
+
+    memory_format = torch.channels_last if channels_last else torch.contiguous_format
+    example = torch.zeros(1, 3, *image_size).contiguous(memory_format=memory_format)
+    model = model.to(memory_format=memory_format)
+
+    if backend == "eager":
+        return model
+
+    if backend == "torchscript":
+        with torch.no_grad():
+            traced = torch.jit.trace(model, example)
+            frozen = torch.jit.freeze(traced)
+            return torch.jit.optimize_for_inference(frozen)
+
+    if backend == "compile":
+        # dynamic=True : la taille des lots varie avec le micro-batching
+        return torch.compile(model, dynamic=True)
+
+    if calibration is None:
+        calibration = torch.rand(8, 3, *image_size)
+    return _quantize_int8(model, calibration.contiguous(memory_format=memory_format))
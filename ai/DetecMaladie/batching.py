@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from config import env
+from metrics import metrics
+from ai.DetecMaladie.classifier import DiseaseClassifier
+from ai.DetecMaladie.service import disease_model
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = int(env("DISEASE_BATCH_SIZE", 16))
+MAX_WAIT_MS = float(env("DISEASE_BATCH_MAX_WAIT_MS", 5))
+TOP_K = int(env("DISEASE_TOP_K", 3))
+
+
+class BatchingPredictor:
+    """
+    File d'attente de micro-batching devant le modèle de détection de maladies.
+    Les requêtes concurrentes sont regroupées (jusqu'à max_batch_size images ou max_wait_ms)
+    puis prédites en une seule passe, sur un thread dédié pour ne pas bloquer l'event loop.
+    """
+
+    def __init__(self, model: DiseaseClassifier, max_batch_size: int = MAX_BATCH_SIZE,
+                 max_wait_ms: float = MAX_WAIT_MS):
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue = None
+        self._worker = None
+        # Buffer de lot préalloué, réutilisé d'une passe à l'autre (une seule passe à la fois)
+        self._buffer = np.empty((self.max_batch_size, 3, *model.image_size), dtype=np.float32)
+        # Un seul thread : les passes se succèdent, le parallélisme est dans le runtime
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="disease-batch")
+
+        self.batch_size_hist = metrics.histogram("disease_batch_size", [1, 2, 4, 8, 16, 32, 64])
+        self.queue_wait_hist = metrics.histogram(
+            "disease_queue_wait_seconds", [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25]
+        )
+        self.inference_hist = metrics.histogram(
+            "disease_batch_inference_seconds", [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5]
+        )
+
+    def start(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def predict(self, image_tensor) -> dict:
+        """Soumet une image prétraitée (voir preprocess) et attend son label, sa confiance et son top-k."""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((image_tensor, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _infer(self, items: list) -> list:
+        # Sur le thread dédié : l'empilement (copie de N images) ne bloque pas l'event loop
+        return self.model.predict_batch_proba(self.model.collate(items, out=self._buffer), TOP_K)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            batch = [item for item in batch if not item[1].cancelled()]
+            if not batch:
+                continue
+
+            now = time.perf_counter()
+            for _, _, enqueued_at in batch:
+                self.queue_wait_hist.observe(now - enqueued_at)
+            self.batch_size_hist.observe(len(batch))
+
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, self._infer, [tensor for tensor, _, _ in batch]
+                )
+            except Exception as e:
+                logger.error(f"Erreur lors de la prédiction par lot : {e}", exc_info=True)
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finally:
+                self.inference_hist.observe(time.perf_counter() - now)
+
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+# Instance partagée par tous les handlers du worker
+disease_batcher = BatchingPredictor(disease_model)
@@ -0,0 +1,121 @@
+import io
+from abc import ABC, abstractmethod
+
+import numpy as np
+from PIL import Image
+
+from ai.aimodel import AIModel
+from config import env
+
+# eager | torchscript | compile | int8 (voir backends.py) | onnx (voir onnx_model.py)
+DISEASE_BACKEND = env("DISEASE_BACKEND", "eager")
+
+
+class DiseaseClassifier(AIModel, ABC):
+    """
+    Partie commune aux modèles de détection de maladies (PyTorch ou ONNX Runtime) :
+    labels, mise en forme du top-k et encodage compact pour la base.
+    Ce module n'importe pas torch.
+    """
+    disease_class_labels = ['Apple___Apple_scab', 'Apple___Black_rot', 'Apple___Cedar_apple_rust', 'Apple___healthy',
+                            'Blueberry___healthy', 'Cherry_(including_sour)___Powdery_mildew',
+                            'Cherry_(including_sour)___healthy',
+                            'Corn_(maize)___Cercospora_leaf_spot Gray_leaf_spot', 'Corn_(maize)___Common_rust_',
+                            'Corn_(maize)___Northern_Leaf_Blight',
+                            'Corn_(maize)___healthy', 'Grape___Black_rot', 'Grape___Esca_(Black_Measles)',
+                            'Grape___Leaf_blight_(Isariopsis_Leaf_Spot)',
+                            'Grape___healthy', 'Orange___Haunglongbing_(Citrus_greening)', 'Peach___Bacterial_spot',
+                            'Peach___healthy',
+                            'Pepper,_bell___Bacterial_spot', 'Pepper,_bell___healthy', 'Potato___Early_blight',
+                            'Potato___Late_blight',
+                            'Potato___healthy', 'Raspberry___healthy', 'Soybean___healthy', 'Squash___Powdery_mildew',
+                            'Strawberry___Leaf_scorch', 'Strawberry___healthy', 'Tomato___Bacterial_spot',
+                            'Tomato___Early_blight',
+                            'Tomato___Late_blight', 'Tomato___Leaf_Mold', 'Tomato___Septoria_leaf_spot',
+                            'Tomato___Spider_mites Two-spotted_spider_mite',
+                            'Tomato___Target_Spot', 'Tomato___Tomato_Yellow_Leaf_Curl_Virus',
+                            'Tomato___Tomato_mosaic_virus',
+                            'Tomato___healthy']
+
+    image_size = (256, 256)
+    # Température de calibration du softmax (1.0 = softmax brut)
+    temperature = float(env("DISEASE_SOFTMAX_TEMPERATURE", 1.0))
+
+    def decode(self, source) -> Image:
+        """
+        Décode une image depuis ses octets ou depuis le fichier reçu (chemin), lu par PIL au fil du décodage.
+        Pour les JPEG, le mode draft laisse libjpeg réduire l'image (1/2, 1/4, 1/8) au décodage,
+        sans descendre sous image_size : une photo de 12 Mpx n'est jamais décodée en entier.
+        """
+        image = Image.open(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+        image.draft("RGB", self.image_size[::-1])
+        return image.convert("RGB")
+
+    def preprocess(self, image: Image) -> np.ndarray:
+        """Image PIL -> tableau uint8 H x W x 3 (Resize bilinéaire, comme transforms.Resize)."""
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        if image.size != self.image_size[::-1]:
+            image = image.resize(self.image_size[::-1], Image.BILINEAR)
+        return np.asarray(image)
+
+    def collate(self, items: list, out: np.ndarray = None) -> np.ndarray:
+        """
+        Empile des images prétraitées en un lot float32 N x 3 x H x W normalisé dans [0, 1]
+        (comme transforms.ToTensor). Si `out` est fourni, le lot est écrit dans ce buffer
+        préalloué au lieu d'en allouer un nouveau.
+        """
+        n = len(items)
+        if out is not None and len(out) >= n:
+            batch = out[:n]
+        else:
+            batch = np.empty((n, 3, *self.image_size), dtype=np.float32)
+        for i, item in enumerate(items):
+            np.multiply(item.transpose(2, 0, 1), np.float32(1 / 255), out=batch[i], casting="unsafe")
+        return batch
+
+    def transform(self, image: Image):
+        """Image PIL -> tenseur 3 x H x W (prétraitement complet d'une seule image)."""
+        return self.collate([self.preprocess(image)])[0]
+
+    @abstractmethod
+    def predict_batch_proba(self, batch, top_k: int = 3) -> list:
+        """
+        Renvoie pour chaque image du lot le label, sa probabilité (softmax calibré)
+        et les top_k classes les plus probables, en une seule passe.
+        """
+
+    def predict_batch(self, batch) -> list:
+        """Prédit les maladies d'un lot d'images déjà transformées (N x 3 x H x W)."""
+        return [result["label"] for result in self.predict_batch_proba(batch, top_k=1)]
+
+    def predict(self, image: Image):
+        return self.predict_batch(self.collate([self.preprocess(image)]))[0]
+
+    def _format_results(self, values: list, indices: list) -> list:
+        results = []
+        for probs, classes in zip(values, indices):
+            results.append({
+                "label": self.disease_class_labels[classes[0]],
+                "confidence": probs[0],
+                "top_k": [
+                    {"class_index": c, "label": self.disease_class_labels[c], "probability": p}
+                    for c, p in zip(classes, probs)
+                ]
+            })
+        return results
+
+    @staticmethod
+    def encode_top_k(top_k: list) -> str:
+        """Format compact pour la base : "index:proba,index:proba"."""
+        return ",".join(f"{item['class_index']}:{item['probability']:.4f}" for item in top_k)
+
+    @classmethod
+    def decode_top_k(cls, encoded: str) -> list:
+        if not encoded:
+            return []
+        decoded = []
+        for item in encoded.split(","):
+            index, probability = item.split(":")
+            decoded.append({"label": cls.disease_class_labels[int(index)], "probability": float(probability)})
+        return decoded
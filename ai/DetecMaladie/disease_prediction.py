@@ -1,16 +1,23 @@
 from pathlib import Path
+import threading
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning)
 
 
+import numpy as np
 import torch
 import torch.nn as nn
-from PIL import Image
 
-from ai.aimodel import AIModel
+from ai.DetecMaladie.classifier import DiseaseClassifier, DISEASE_BACKEND
+from ai.DetecMaladie.backends import build_backend, configure_threads, load_calibration_batch
+from config import env
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
+DISEASE_CHANNELS_LAST = env("DISEASE_CHANNELS_LAST", "false").lower() in ("1", "true", "yes")
+DISEASE_NUM_THREADS = int(env("DISEASE_NUM_THREADS", 0))
+DISEASE_CALIBRATION_DIR = env("DISEASE_CALIBRATION_DIR", "storage/plants")
+
 
 def ConvBlock(in_channels, out_channels, pool=False):
     layers = [nn.Conv2d(in_channels, out_channels, kernel_size=3, padding=1),
@@ -48,54 +55,55 @@ class ResNet9(nn.Module):
         return out
 
 
-import torchvision.transforms as transforms
-
-
-class PlantDiseaseModel(AIModel):
-    disease_class_labels = ['Apple___Apple_scab', 'Apple___Black_rot', 'Apple___Cedar_apple_rust', 'Apple___healthy',
-                            'Blueberry___healthy', 'Cherry_(including_sour)___Powdery_mildew',
-                            'Cherry_(including_sour)___healthy',
-                            'Corn_(maize)___Cercospora_leaf_spot Gray_leaf_spot', 'Corn_(maize)___Common_rust_',
-                            'Corn_(maize)___Northern_Leaf_Blight',
-                            'Corn_(maize)___healthy', 'Grape___Black_rot', 'Grape___Esca_(Black_Measles)',
-                            'Grape___Leaf_blight_(Isariopsis_Leaf_Spot)',
-                            'Grape___healthy', 'Orange___Haunglongbing_(Citrus_greening)', 'Peach___Bacterial_spot',
-                            'Peach___healthy',
-                            'Pepper,_bell___Bacterial_spot', 'Pepper,_bell___healthy', 'Potato___Early_blight',
-                            'Potato___Late_blight',
-                            'Potato___healthy', 'Raspberry___healthy', 'Soybean___healthy', 'Squash___Powdery_mildew',
-                            'Strawberry___Leaf_scorch', 'Strawberry___healthy', 'Tomato___Bacterial_spot',
-                            'Tomato___Early_blight',
-                            'Tomato___Late_blight', 'Tomato___Leaf_Mold', 'Tomato___Septoria_leaf_spot',
-                            'Tomato___Spider_mites Two-spotted_spider_mite',
-                            'Tomato___Target_Spot', 'Tomato___Tomato_Yellow_Leaf_Curl_Virus',
-                            'Tomato___Tomato_mosaic_virus',
-                            'Tomato___healthy']
-
-    def __init__(self):
+class PlantDiseaseModel(DiseaseClassifier):
+
+    def __init__(self, backend: str = DISEASE_BACKEND, channels_last: bool = DISEASE_CHANNELS_LAST):
+        self.backend = backend
+        self.channels_last = channels_last
         self.model = None
-        self.transform = transforms.Compose([
-            transforms.Resize((256, 256)),
-            transforms.ToTensor(),
-        ])
+        self._load_lock = threading.Lock()
 
     def load_model(self):
         if self.model is not None:
             return
-        self.model = ResNet9(3, len(self.disease_class_labels))
-        parent_path = Path(__file__).parent
-        state_dict = torch.load(parent_path / 'plant-disease-model.pth', device)
-        self.model.load_state_dict(state_dict)
-        self.model.eval()
+        with self._load_lock:
+            if self.model is not None:
+                return
+            model = ResNet9(3, len(self.disease_class_labels))
+            parent_path = Path(__file__).parent
+            state_dict = torch.load(parent_path / 'plant-disease-model.pth', device)
+            model.load_state_dict(state_dict)
+            model.eval()
+
+            calibration = None
+            if self.backend == "int8":
+                calibration = load_calibration_batch(DISEASE_CALIBRATION_DIR, self.transform)
+            self.model = build_backend(model, self.backend, self.image_size,
+                                       channels_last=self.channels_last, calibration=calibration)
+
+    def warm_up(self):
+        self.load_model()
+        dummy = self._to_memory_format(torch.zeros(1, 3, *self.image_size))
+        with torch.no_grad():
+            self.model(dummy)
 
-    def predict(self, image: Image):
+    def _to_memory_format(self, batch: torch.Tensor) -> torch.Tensor:
+        if self.channels_last:
+            return batch.contiguous(memory_format=torch.channels_last)
+        return batch
+
+    def predict_batch_proba(self, batch: torch.Tensor, top_k: int = 3) -> list:
         self.load_model()
-        image_tensor = self.transform(image).unsqueeze(0)
-        predicted_disease = None
         with torch.no_grad():
-            output = self.model(image_tensor)
-            _, predicted = torch.max(output.data, 1)
-            disease_index = predicted.item()
-            predicted_disease = self.disease_class_labels[disease_index]
+            output = self.model(self._to_memory_format(batch))
+            probabilities = torch.softmax(output / self.temperature, dim=1)
+            values, indices = probabilities.topk(min(top_k, len(self.disease_class_labels)), dim=1)
+
+        return self._format_results(values.tolist(), indices.tolist())
+
+    def collate(self, items: list, out: np.ndarray = None) -> torch.Tensor:
+        # torch.from_numpy partage la mémoire du lot numpy : aucune copie supplémentaire
+        return torch.from_numpy(super().collate(items, out))
+
 
-        return predicted_disease
+configure_threads(DISEASE_NUM_THREADS)
@@ -0,0 +1,25 @@
+import numpy as np
+
+from ai.DetecMaladie.classifier import DiseaseClassifier
+from ai.onnx_runtime import OnnxRuntimeModel, ONNX_MODEL_DIR
+
+
+class OnnxPlantDiseaseModel(DiseaseClassifier, OnnxRuntimeModel):
+    """ResNet9 exporté en ONNX : même prétraitement et mêmes sorties que PlantDiseaseModel."""
+
+    def __init__(self, model_path=ONNX_MODEL_DIR / "plant-disease-model.onnx"):
+        super().__init__(model_path)
+
+    def predict_batch_proba(self, batch: np.ndarray, top_k: int = 3) -> list:
+        logits = self.run(batch)[0] / self.temperature
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+
+        top_k = min(top_k, len(self.disease_class_labels))
+        indices = np.argsort(-probabilities, axis=1)[:, :top_k]
+        values = np.take_along_axis(probabilities, indices, axis=1)
+        return self._format_results(values.tolist(), indices.tolist())
+
+    def warm_up(self):
+        self.predict_batch_proba(np.zeros((1, 3, *self.image_size), dtype=np.float32))
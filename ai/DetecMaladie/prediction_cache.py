@@ -0,0 +1,120 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from PIL import Image
+
+from config import env
+from metrics import metrics
+
+CACHE_SIZE = int(env("DISEASE_CACHE_SIZE", 4096))
+CACHE_TTL = float(env("DISEASE_CACHE_TTL", 24 * 3600))
+# Distance de Hamming maximale (sur 64 bits) pour considérer deux photos comme identiques
+CACHE_MAX_DISTANCE = int(env("DISEASE_CACHE_MAX_DISTANCE", 4))
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def perceptual_hash(image: Image) -> int:
+    """dHash 64 bits : robuste au recadrage léger, à la recompression JPEG et au redimensionnement."""
+    pixels = list(image.convert("L").resize((9, 8), Image.BILINEAR).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left, right = pixels[row * 9 + col], pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+class PredictionCache:
+    """
+    Cache LRU + TTL des prédictions, indexé par hash exact (sha256 du fichier)
+    et par hash perceptuel (photos quasi identiques re-soumises).
+
+    Recherche des quasi-doublons sans parcourir tout le cache : le dHash est découpé en
+    max_distance + 1 bandes, et deux hashes à au plus max_distance bits d'écart ont forcément
+    une bande identique (principe des tiroirs). Seules les entrées partageant une bande avec
+    la photo soumise sont comparées.
+    """
+
+    def __init__(self, max_size: int = CACHE_SIZE, ttl: float = CACHE_TTL,
+                 max_distance: int = CACHE_MAX_DISTANCE):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_distance = max_distance
+        bands = min(max(max_distance, 0) + 1, 64)
+        self._bands = [(i * 64 // bands, (1 << ((i + 1) * 64 // bands - i * 64 // bands)) - 1)
+                       for i in range(bands)]  # (décalage, masque) de chaque bande
+        self._entries = OrderedDict()  # sha256 -> (phash, result, expires_at)
+        self._buckets = {}  # (numéro de bande, valeur de la bande) -> {sha256}
+        self._lock = threading.Lock()
+        self.hits = metrics.counter("disease_cache_hits")
+        self.near_hits = metrics.counter("disease_cache_near_hits")
+        self.misses = metrics.counter("disease_cache_misses")
+
+    def _band_keys(self, phash: int):
+        return [(i, (phash >> shift) & mask) for i, (shift, mask) in enumerate(self._bands)]
+
+    def _remove(self, key):
+        phash = self._entries.pop(key)[0]
+        for band_key in self._band_keys(phash):
+            bucket = self._buckets[band_key]
+            bucket.discard(key)
+            if not bucket:
+                del self._buckets[band_key]
+
+    def _alive(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[2] < now:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get_exact(self, digest: str):
+        with self._lock:
+            entry = self._alive(digest, time.monotonic())
+        if entry is not None:
+            self.hits.inc()
+            return entry[1]
+        return None
+
+    def get_similar(self, phash: int):
+        now = time.monotonic()
+        with self._lock:
+            candidates = set()
+            for band_key in self._band_keys(phash):
+                candidates.update(self._buckets.get(band_key, ()))
+            best_key, best_distance = None, self.max_distance + 1
+            for key in candidates:
+                candidate, _, expires_at = self._entries[key]
+                if expires_at < now:
+                    continue
+                distance = (candidate ^ phash).bit_count()
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+            entry = self._alive(best_key, now) if best_key is not None else None
+        if entry is not None:
+            self.near_hits.inc()
+            return entry[1]
+        self.misses.inc()
+        return None
+
+    def put(self, digest: str, phash: int, result: dict):
+        with self._lock:
+            if digest in self._entries:
+                self._remove(digest)
+            self._entries[digest] = (phash, result, time.monotonic() + self.ttl)
+            for band_key in self._band_keys(phash):
+                self._buckets.setdefault(band_key, set()).add(digest)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+
+# Instance partagée par tous les handlers du worker
+prediction_cache = PredictionCache()
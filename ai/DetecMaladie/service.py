@@ -0,0 +1,16 @@
+from ai.registry import registry
+from ai.DetecMaladie.classifier import DiseaseClassifier, DISEASE_BACKEND
+
+
+def build_disease_model(backend: str = DISEASE_BACKEND) -> DiseaseClassifier:
+    # Avec le backend onnx, torch n'est jamais importé par le worker
+    if backend == "onnx":
+        from ai.DetecMaladie.onnx_model import OnnxPlantDiseaseModel
+        return OnnxPlantDiseaseModel()
+
+    from ai.DetecMaladie.disease_prediction import PlantDiseaseModel
+    return PlantDiseaseModel(backend=backend)
+
+
+# Instance partagée : les poids ne sont chargés qu'une fois par worker
+disease_model = registry.register("disease", build_disease_model())
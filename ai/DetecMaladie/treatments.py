@@ -0,0 +1,67 @@
+from types import MappingProxyType
+
+from sqlalchemy import select
+
+from DB.models import TreatmentReference
+from DB.reference import ReferenceCache, reference_key
+
+EMPTY_CRITERIA = MappingProxyType({"gravites": [], "stades": [], "dars": [], "all_matieres": []})
+
+
+def split_prediction(label: str):
+    """"Apple___Apple_scab" -> ("Apple", "Apple scab") ; None si le label n'a pas ce format."""
+    if "___" not in label:
+        return None
+    plant, disease = [part.strip().replace("_", " ") for part in label.split("___")]
+    return plant, disease
+
+
+class TreatmentIndex:
+    """
+    Matières actives lues dans la table ref_traitements (voir `python -m DB.import_reference`),
+    chargées en entier par worker et indexées en mémoire :
+    - par (plante, maladie) normalisés -> critères disponibles précalculés ;
+    - par (plante, maladie, gravité, stade, DAR) -> traitement.
+    Rechargées au prochain import.
+    """
+
+    def __init__(self):
+        self._cache = ReferenceCache("traitements", self._load)
+
+    @staticmethod
+    def _load(db) -> dict:
+        rows = db.execute(
+            select(
+                TreatmentReference.plant_key, TreatmentReference.disease_key, TreatmentReference.gravite,
+                TreatmentReference.stade, TreatmentReference.dar, TreatmentReference.entry,
+            ).order_by(TreatmentReference.position)
+        ).all()
+        entries, matches = {}, {}
+        for plant_key, disease_key, gravite, stade, dar, entry in rows:
+            entries.setdefault((plant_key, disease_key), []).append(entry)
+            # Comme avant : le premier traitement du fichier l'emporte pour des critères identiques
+            matches.setdefault((plant_key, disease_key, gravite, stade, dar), entry)
+        criteria = {
+            key: MappingProxyType({
+                "gravites": sorted(set(e["Gravité ciblée"] for e in group if e.get("Gravité ciblée"))),
+                "stades": sorted(set(e["Stade recommandé"] for e in group if e.get("Stade recommandé"))),
+                "dars": sorted(set(str(e["DAR"]).strip() for e in group if e.get("DAR"))),
+                "all_matieres": group,
+            })
+            for key, group in entries.items()
+        }
+        return {"criteres": criteria, "traitements": matches}
+
+    async def criteria(self, plant: str, disease: str):
+        """Gravités, stades, DAR et traitements disponibles (listes vides si le couple est inconnu)."""
+        index = await self._cache.get_async()
+        return index["criteres"].get((reference_key(plant), reference_key(disease)), EMPTY_CRITERIA)
+
+    async def match(self, plant: str, disease: str, gravite: str, stade: str, dar: str):
+        index = await self._cache.get_async()
+        key = (reference_key(plant), reference_key(disease), gravite, stade, str(dar).strip())
+        return index["traitements"].get(key)
+
+
+# Instance partagée par tous les handlers du worker
+treatment_index = TreatmentIndex()
@@ -1,39 +1,83 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import pickle
 from pathlib import Path
-from collections import Counter
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning)
 
 
+import numpy as np
+
 from ai.aimodel import AIModel
+from ai.onnx_runtime import OnnxRuntimeModel, ONNX_MODEL_DIR
+from ai.registry import registry
+from config import env
 
 parent_path = Path(__file__).parent
 
+# sklearn (pickles) | onnx (pipelines scaler + modèle exportés par python -m ai.onnx_export)
+CROP_RECOMMENDER_BACKEND = env("CROP_RECOMMENDER_BACKEND", "sklearn")
+# hard (vote majoritaire) | soft (moyenne pondérée des predict_proba)
+CROP_ENSEMBLE_VOTING = env("CROP_ENSEMBLE_VOTING", "hard")
+CROP_ENSEMBLE_WEIGHTS = env("CROP_ENSEMBLE_WEIGHTS", "")
+CROP_ENSEMBLE_PARALLEL = env("CROP_ENSEMBLE_PARALLEL", "false").lower() in ("1", "true", "yes")
+N_FEATURES = 7
+
+
+@lru_cache(maxsize=None)
+def load_scaler():
+    """Le scaler est désérialisé une seule fois et partagé par tous les modèles."""
+    with open(parent_path / "scaler.pkl", "rb") as f:
+        return pickle.load(f)
+
 
 class RecommendationAIModel(AIModel, ABC):
 
-    def __init__(self):
-        self.scaler = None
-        with open(parent_path / "scaler.pkl", "rb") as f:
-            self.scaler = pickle.load(f)
+    def __init__(self, scaler=None):
+        self.scaler = scaler if scaler is not None else load_scaler()
 
-    def predict(self, X):
-        scaled_x = X
+    def scale(self, X) -> np.ndarray:
+        scaled_X = np.asarray(X, dtype=np.float64)
         if self.scaler is not None:
-            scaled_x = self.scaler.transform([X])
+            scaled_X = self.scaler.transform(scaled_X)
+        return scaled_X
+
+    def predict(self, X):
+        return self.forward(self.scale([X]))
 
-        return self.forward(scaled_x)
+    def predict_many(self, X) -> np.ndarray:
+        """Prédit une matrice d'échantillons (n x 7) en un seul appel au scaler et au modèle."""
+        return self.forward_many(self.scale(X))
+
+    def warm_up(self):
+        n_features = getattr(self.scaler, "n_features_in_", N_FEATURES)
+        self.predict([0.0] * n_features)
 
     @abstractmethod
     def forward(self, scaled_x):
         pass
 
+    @abstractmethod
+    def forward_many(self, scaled_X) -> np.ndarray:
+        pass
+
+    def forward_proba_many(self, scaled_X):
+        """(classes, probabilités n x k) ; vote « one-hot » si le modèle n'a pas de predict_proba."""
+        return one_hot(self.forward_many(scaled_X))
+
+
+def one_hot(labels):
+    classes, codes = np.unique(np.asarray(labels).astype(str), return_inverse=True)
+    proba = np.zeros((len(codes), len(classes)))
+    proba[np.arange(len(codes)), codes] = 1.0
+    return classes, proba
+
 
 class SklearnBasedModel(RecommendationAIModel):
 
-    def __init__(self, f_name):
-        super().__init__()
+    def __init__(self, f_name, scaler=None):
+        super().__init__(scaler)
         self.model = None
         with open(f_name, "rb") as f:
             self.model = pickle.load(f)
@@ -42,25 +86,130 @@ class SklearnBasedModel(RecommendationAIModel):
         predicted_y = self.model.predict(scaled_x)
         return predicted_y[0]
 
+    def forward_many(self, scaled_X) -> np.ndarray:
+        return self.model.predict(scaled_X)
 
-lr_model = SklearnBasedModel(parent_path / "logistic_model.pkl")
-nb_model = SklearnBasedModel(parent_path / "naive_bayes_model.pkl")
-svm_model = SklearnBasedModel(parent_path / "svm_model.pkl")
+    def forward_proba_many(self, scaled_X):
+        # SVC sans probability=True n'expose pas predict_proba (hasattr renvoie False)
+        if not hasattr(self.model, "predict_proba"):
+            return super().forward_proba_many(scaled_X)
+        return np.asarray(self.model.classes_).astype(str), self.model.predict_proba(scaled_X)
+
+
+class OnnxRecommendationModel(OnnxRuntimeModel):
+    """Pipeline scaler + classifieur exporté en ONNX (la normalisation est incluse dans le graphe)."""
+
+    def predict(self, X):
+        labels = self.run(np.asarray([X], dtype=np.float32))[0]
+        return str(labels[0])
+
+    def predict_many(self, X) -> np.ndarray:
+        return np.asarray(self.run(np.asarray(X, dtype=np.float32))[0])
+
+    def warm_up(self):
+        self.predict([0.0] * N_FEATURES)
+
+
+if CROP_RECOMMENDER_BACKEND == "onnx":
+    lr_model = OnnxRecommendationModel(ONNX_MODEL_DIR / "logistic_model.onnx")
+    nb_model = OnnxRecommendationModel(ONNX_MODEL_DIR / "naive_bayes_model.onnx")
+    svm_model = OnnxRecommendationModel(ONNX_MODEL_DIR / "svm_model.onnx")
+else:
+    lr_model = SklearnBasedModel(parent_path / "logistic_model.pkl")
+    nb_model = SklearnBasedModel(parent_path / "naive_bayes_model.pkl")
+    svm_model = SklearnBasedModel(parent_path / "svm_model.pkl")
 
 
 class MultiModelBasedRecommender(AIModel):
+    """
+    Ensemble de modèles. Quand tous les membres partagent le même scaler, chaque entrée
+    n'est normalisée qu'une fois et le tableau normalisé est passé à tous les membres.
+    """
 
-    def __init__(self, *models):
+    def __init__(self, *models, voting: str = "hard", weights=None, parallel: bool = False):
         for model in models:
             if not isinstance(model, AIModel):
                 raise TypeError("Instance of AIModel class is required as model object")
+        if voting not in ("hard", "soft"):
+            raise ValueError("voting doit valoir 'hard' ou 'soft'")
+        if weights is not None and len(weights) != len(models):
+            raise ValueError("Il faut un poids par modèle")
         self.models = models
+        self.voting = voting
+        self.weights = list(weights) if weights is not None else [1.0] * len(models)
+        self._executor = ThreadPoolExecutor(max_workers=len(models)) if parallel else None
 
-    def predict(self, x):
-        predictions = [m(x) for m in self.models]
-        counter = Counter(predictions)
-        voted = counter.most_common(1)
-        return voted[0][0]
+        scalers = {id(m.scaler) for m in models if isinstance(m, RecommendationAIModel)}
+        shared = all(isinstance(m, RecommendationAIModel) for m in models) and len(scalers) == 1
+        self.scaler = models[0].scaler if shared else None
+
+    def _map(self, fn):
+        if self._executor is not None:
+            return list(self._executor.map(fn, self.models))
+        return [fn(m) for m in self.models]
 
+    def _member_outputs(self, X):
+        if self.scaler is not None:
+            scaled_X = self.scaler.transform(X)
+            if self.voting == "soft":
+                return self._map(lambda m: m.forward_proba_many(scaled_X))
+            return self._map(lambda m: m.forward_many(scaled_X))
+
+        if self.voting == "soft":
+            return self._map(lambda m: one_hot(m.predict_many(X)))
+        return self._map(lambda m: m.predict_many(X))
 
-recommender_model = MultiModelBasedRecommender(lr_model, nb_model, svm_model)
+    def predict(self, x):
+        return str(self.predict_many([x])[0])
+
+    def predict_many(self, X) -> np.ndarray:
+        """
+        Vote vectorisé sur toutes les lignes de X.
+        hard : vote majoritaire (pondéré) ; en cas d'égalité, le label du premier modèle
+        l'emporte (comme Counter.most_common). soft : argmax de la moyenne pondérée des probabilités.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        outputs = self._member_outputs(X)
+        if self.voting == "soft":
+            return self._soft_vote(outputs)
+        return self._hard_vote(outputs)
+
+    def _hard_vote(self, outputs) -> np.ndarray:
+        predictions = np.stack([np.asarray(labels).astype(str) for labels in outputs])
+        labels, codes = np.unique(predictions, return_inverse=True)
+        codes = codes.reshape(predictions.shape)  # n_models x n_rows
+
+        n_rows = codes.shape[1]
+        rows = np.arange(n_rows)
+        votes = np.zeros((n_rows, len(labels)))
+        for model_codes, weight in zip(codes, self.weights):
+            votes[rows, model_codes] += weight
+        best = votes.max(axis=1)
+
+        chosen = np.full(n_rows, -1)
+        for model_codes in codes:
+            pick = (chosen < 0) & (votes[rows, model_codes] == best)
+            chosen[pick] = model_codes[pick]
+        return labels[chosen]
+
+    def _soft_vote(self, outputs) -> np.ndarray:
+        labels = np.unique(np.concatenate([classes for classes, _ in outputs]))
+        total = np.zeros((outputs[0][1].shape[0], len(labels)))
+        for (classes, proba), weight in zip(outputs, self.weights):
+            total[:, np.searchsorted(labels, classes)] += weight * proba
+        return labels[total.argmax(axis=1)]
+
+    def warm_up(self):
+        for model in self.models:
+            model.warm_up()
+
+
+recommender_model = registry.register(
+    "crop_recommender",
+    MultiModelBasedRecommender(
+        lr_model, nb_model, svm_model,
+        voting=CROP_ENSEMBLE_VOTING,
+        weights=[float(w) for w in CROP_ENSEMBLE_WEIGHTS.split(",")] if CROP_ENSEMBLE_WEIGHTS else None,
+        parallel=CROP_ENSEMBLE_PARALLEL,
+    )
+)
@@ -6,5 +6,9 @@ class AIModel(ABC):
     def predict(self, *args, **kwargs):
         pass
 
+    def warm_up(self):
+        """Charge les poids et exécute une prédiction factice (aucune par défaut)."""
+        pass
+
     def __call__(self, *args, **kwargs):
         return self.predict(*args, **kwargs)
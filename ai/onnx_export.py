@@ -0,0 +1,142 @@
+"""
+Export des modèles vers ONNX (à lancer une fois, hors du worker API).
+
+Usage (depuis la racine du projet) :
+    python -m ai.onnx_export [--output ai/onnx] [--skip-disease] [--skip-recommenders]
+
+Dépendances supplémentaires pour l'export uniquement : onnx, skl2onnx.
+Ensuite : DISEASE_BACKEND=onnx et/ou CROP_RECOMMENDER_BACKEND=onnx.
+"""
+import argparse
+import pickle
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from ai.onnx_runtime import ONNX_MODEL_DIR
+
+RECOMMENDER_PICKLES = ("logistic_model", "naive_bayes_model", "svm_model")
+
+# Part minimale de prédictions identiques ONNX / sklearn (float32 vs float64 aux frontières de décision)
+MIN_AGREEMENT = 0.99
+
+
+def export_disease_model(output_dir: Path, opset: int = 17) -> Path:
+    import torch
+    from ai.DetecMaladie.disease_prediction import PlantDiseaseModel
+
+    model = PlantDiseaseModel(backend="eager")
+    model.load_model()
+    target = output_dir / "plant-disease-model.onnx"
+    example = torch.zeros(1, 3, *model.image_size)
+    torch.onnx.export(
+        model.model.cpu(),
+        example,
+        str(target),
+        input_names=["image"],
+        output_names=["logits"],
+        dynamic_axes={"image": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=opset,
+    )
+    return target
+
+
+def export_recommenders(output_dir: Path, opset: int = 17, min_agreement: float = MIN_AGREEMENT) -> list:
+    """
+    Chaque classifieur est exporté avec le scaler, en un seul graphe scaler -> modèle.
+    Tout ou rien : les graphes sont écrits en `.onnx.tmp` et ne remplacent les fichiers en place
+    qu'une fois la parité vérifiée pour les trois ; sinon l'export précédent reste intact.
+    """
+    from sklearn.pipeline import Pipeline
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+
+    rec_dir = Path(__file__).parent / "RecCultures"
+    with open(rec_dir / "scaler.pkl", "rb") as f:
+        scaler = pickle.load(f)
+    n_features = getattr(scaler, "n_features_in_", 7)
+
+    pending = []
+    try:
+        for name in RECOMMENDER_PICKLES:
+            with open(rec_dir / f"{name}.pkl", "rb") as f:
+                classifier = pickle.load(f)
+            pipeline = Pipeline([("scaler", scaler), ("classifier", classifier)])
+            onnx_model = convert_sklearn(
+                pipeline,
+                initial_types=[("features", FloatTensorType([None, n_features]))],
+                options={id(classifier): {"zipmap": False}},
+                target_opset={"": opset, "ai.onnx.ml": 3},
+            )
+            tmp_target = output_dir / f"{name}.onnx.tmp"
+            tmp_target.write_bytes(onnx_model.SerializeToString())
+            pending.append(tmp_target)
+
+            # Contrôle de parité rapide sur des entrées aléatoires autour de la moyenne du scaler
+            check_parity(tmp_target, pipeline, scaler, n_features, min_agreement=min_agreement)
+    except BaseException:
+        for tmp_target in pending:
+            tmp_target.unlink(missing_ok=True)
+        raise
+
+    targets = []
+    for tmp_target in pending:
+        target = tmp_target.with_suffix("")
+        tmp_target.replace(target)
+        targets.append(target)
+    return targets
+
+
+def check_parity(target: Path, pipeline, scaler, n_features: int, samples: int = 200,
+                 min_agreement: float = MIN_AGREEMENT) -> float:
+    """
+    Compare les labels ONNX et sklearn ; sous `min_agreement`, le fichier exporté est supprimé
+    (il ne doit pas être servi avec CROP_RECOMMENDER_BACKEND=onnx) et RuntimeError est levée.
+    """
+    import onnxruntime as ort
+
+    rng = np.random.default_rng(0)
+    mean = getattr(scaler, "mean_", np.zeros(n_features))
+    scale = getattr(scaler, "scale_", np.ones(n_features))
+    X = (mean + rng.standard_normal((samples, n_features)) * scale).astype(np.float32)
+
+    session = ort.InferenceSession(str(target), providers=["CPUExecutionProvider"])
+    onnx_labels = session.run(None, {session.get_inputs()[0].name: X})[0]
+    sklearn_labels = pipeline.predict(X)
+    agreement = float(np.mean(np.asarray(onnx_labels) == sklearn_labels))
+    print(f"{target.name} : accord ONNX / sklearn = {agreement:.1%}")
+    if agreement < min_agreement:
+        target.unlink(missing_ok=True)
+        raise RuntimeError(
+            f"{target.name} : accord ONNX / sklearn {agreement:.1%} inférieur au minimum {min_agreement:.1%}"
+        )
+    return agreement
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=str(ONNX_MODEL_DIR))
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--skip-disease", action="store_true")
+    parser.add_argument("--skip-recommenders", action="store_true")
+    parser.add_argument("--min-agreement", type=float, default=MIN_AGREEMENT,
+                        help="accord minimal ONNX / sklearn, sinon l'export échoue (code de sortie 1)")
+    args = parser.parse_args()
+
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    if not args.skip_disease:
+        print("✅ Exporté :", export_disease_model(output_dir, args.opset))
+    if not args.skip_recommenders:
+        try:
+            targets = export_recommenders(output_dir, args.opset, args.min_agreement)
+        except RuntimeError as e:
+            sys.exit(f"❌ Parité non respectée, modèles de recommandation inchangés : {e}")
+        for target in targets:
+            print("✅ Exporté :", target)
+
+
+if __name__ == "__main__":
+    main()
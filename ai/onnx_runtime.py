@@ -0,0 +1,55 @@
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from ai.aimodel import AIModel
+from config import env
+
+ONNX_MODEL_DIR = Path(env("ONNX_MODEL_DIR", Path(__file__).parent / "onnx"))
+ONNX_INTRA_OP_THREADS = int(env("ONNX_INTRA_OP_THREADS", 0))
+
+
+class OnnxRuntimeModel(AIModel):
+    """
+    Modèle exécuté par ONNX Runtime (CPU), sans import de torch ni de scikit-learn.
+    La session est créée au premier appel puis partagée par tous les handlers du worker.
+    """
+
+    def __init__(self, model_path):
+        self.model_path = Path(model_path)
+        self.session = None
+        self._load_lock = threading.Lock()
+
+    def load_model(self):
+        if self.session is not None:
+            return
+        with self._load_lock:
+            if self.session is not None:
+                return
+            import onnxruntime as ort
+
+            if not self.model_path.exists():
+                raise FileNotFoundError(
+                    f"Modèle ONNX introuvable : {self.model_path} (générer avec python -m ai.onnx_export)"
+                )
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+            options.intra_op_num_threads = ONNX_INTRA_OP_THREADS or (os.cpu_count() or 1)
+            options.inter_op_num_threads = 1
+            self.session = ort.InferenceSession(
+                str(self.model_path), sess_options=options, providers=["CPUExecutionProvider"]
+            )
+            self.input_name = self.session.get_inputs()[0].name
+
+    def run(self, inputs: np.ndarray) -> list:
+        self.load_model()
+        return self.session.run(None, {self.input_name: inputs})
+
+    def predict(self, inputs: np.ndarray):
+        return self.run(inputs)[0]
+
+    def warm_up(self):
+        self.load_model()
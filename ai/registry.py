@@ -0,0 +1,51 @@
+import logging
+import threading
+import time
+
+from ai.aimodel import AIModel
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """
+    Registre des modèles partagés par tous les handlers d'un même worker.
+    Chaque modèle est chargé une seule fois puis réchauffé au démarrage de l'application.
+    """
+
+    def __init__(self):
+        self._models = {}
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def register(self, name: str, model: AIModel) -> AIModel:
+        if not isinstance(model, AIModel):
+            raise TypeError("Instance of AIModel class is required as model object")
+        self._models[name] = model
+        return model
+
+    def get(self, name: str) -> AIModel:
+        try:
+            return self._models[name]
+        except KeyError:
+            raise KeyError(f"Modèle non enregistré : {name}")
+
+    def warm_up(self):
+        with self._lock:
+            if self._ready:
+                return
+            for name, model in self._models.items():
+                start = time.perf_counter()
+                model.warm_up()
+                logger.info("Modèle %s prêt en %.0f ms", name, (time.perf_counter() - start) * 1000)
+            self._ready = True
+
+    def is_ready(self) -> bool:
+        return self._ready
+
+    def status(self) -> dict:
+        return {"ready": self._ready, "models": sorted(self._models)}
+
+
+# Instance unique à utiliser partout
+registry = ModelRegistry()
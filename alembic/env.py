@@ -6,11 +6,14 @@ from sqlalchemy import pool
 from alembic import context
 
 # import your Base where metadata is defined
-from DB.database import Base  # <-- Adjust this import if needed
+from DB.database import Base, DATABASE_URL  # <-- Adjust this import if needed
 
 # this is the Alembic Config object, which provides access to the values within the .ini file in use.
 config = context.config
 
+# Même base que l'application (variable DATABASE_URL), "%" échappé pour configparser
+config.set_main_option("sqlalchemy.url", DATABASE_URL.replace("%", "%%"))
+
 # Interpret the config file for Python logging.
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
@@ -0,0 +1,86 @@
+"""Reference data tables (treatments, irrigation needs, catalogues)
+
+Revision ID: 5b8e0f3a7d21
+Revises: c41d7e2a8b90
+Create Date: 2026-10-18 13:37:05.582946
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8e0f3a7d21'
+down_revision: Union[str, None] = 'c41d7e2a8b90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ref_imports',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('sha256', sa.String(), nullable=False),
+    sa.Column('rows', sa.Integer(), nullable=False),
+    sa.Column('imported_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table('ref_traitements',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('plant_key', sa.String(), nullable=False),
+    sa.Column('disease_key', sa.String(), nullable=False),
+    sa.Column('gravite', sa.String(), nullable=True),
+    sa.Column('stade', sa.String(), nullable=True),
+    sa.Column('dar', sa.String(), nullable=True),
+    sa.Column('matiere_active', sa.String(), nullable=True),
+    sa.Column('entry', sa.JSON(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_ref_traitements_criteres', 'ref_traitements',
+                    ['plant_key', 'disease_key', 'gravite', 'stade', 'dar'], unique=False)
+    op.create_table('ref_besoins_irrigation',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('culture', sa.String(), nullable=False),
+    sa.Column('type_sol', sa.String(), nullable=False),
+    sa.Column('saison', sa.String(), nullable=False),
+    sa.Column('culture_key', sa.String(), nullable=False),
+    sa.Column('type_sol_key', sa.String(), nullable=False),
+    sa.Column('saison_key', sa.String(), nullable=False),
+    sa.Column('frequence_irrigation', sa.Integer(), nullable=False),
+    sa.Column('besoin_quotidien', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('culture_key', 'type_sol_key', 'saison_key', name='uq_ref_besoins_irrigation_cle')
+    )
+    op.create_table('ref_catalogues',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('nom', sa.String(), nullable=False),
+    sa.Column('nom_key', sa.String(), nullable=False),
+    sa.Column('liens_sites', sa.JSON(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('nom_key')
+    )
+    op.create_table('ref_produits',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('catalogue_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('nom', sa.String(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('image', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['catalogue_id'], ['ref_catalogues.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ref_produits_catalogue_id'), 'ref_produits', ['catalogue_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_ref_produits_catalogue_id'), table_name='ref_produits')
+    op.drop_table('ref_produits')
+    op.drop_table('ref_catalogues')
+    op.drop_table('ref_besoins_irrigation')
+    op.drop_index('ix_ref_traitements_criteres', table_name='ref_traitements')
+    op.drop_table('ref_traitements')
+    op.drop_table('ref_imports')
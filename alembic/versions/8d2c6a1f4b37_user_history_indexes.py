@@ -0,0 +1,34 @@
+"""Composite (user_id, id) indexes for per-user history pagination
+
+Revision ID: 8d2c6a1f4b37
+Revises: 5b8e0f3a7d21
+Create Date: 2026-10-18 16:12:40.918304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2c6a1f4b37'
+down_revision: Union[str, None] = '5b8e0f3a7d21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_image_predictions_user_history', 'image_predictions', ['user_id', 'id'], unique=False)
+    op.create_index('ix_crop_recommendations_user_history', 'crop_recommendations', ['user_id', 'id'], unique=False)
+    op.create_index('ix_irrigation_records_user_history', 'irrigation_records', ['user_id', 'id'], unique=False)
+    op.create_index('ix_chatbot_interactions_user_history', 'chatbot_interactions', ['user_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_chatbot_interactions_user_history', table_name='chatbot_interactions')
+    op.drop_index('ix_irrigation_records_user_history', table_name='irrigation_records')
+    op.drop_index('ix_crop_recommendations_user_history', table_name='crop_recommendations')
+    op.drop_index('ix_image_predictions_user_history', table_name='image_predictions')
@@ -0,0 +1,31 @@
+"""Add confidence and top_k to image_predictions
+
+Revision ID: 9f43f555df59
+Revises: 67954ee9dfb6
+Create Date: 2026-10-18 09:12:31.418205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9f43f555df59'
+down_revision: Union[str, None] = '67954ee9dfb6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('image_predictions', sa.Column('confidence', sa.Float(), nullable=True))
+    op.add_column('image_predictions', sa.Column('top_k', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('image_predictions') as batch_op:
+        batch_op.drop_column('top_k')
+        batch_op.drop_column('confidence')
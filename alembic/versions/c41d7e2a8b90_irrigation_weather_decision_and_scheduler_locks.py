@@ -0,0 +1,47 @@
+"""Store weather decision on irrigation_records, add scheduler_locks
+
+Revision ID: c41d7e2a8b90
+Revises: 9f43f555df59
+Create Date: 2026-10-18 11:04:52.207318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41d7e2a8b90'
+down_revision: Union[str, None] = '9f43f555df59'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('irrigation_records', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('irrigation_records', sa.Column('longitude', sa.Float(), nullable=True))
+    op.add_column('irrigation_records', sa.Column('weather_cell', sa.String(), nullable=True))
+    op.add_column('irrigation_records', sa.Column('pluie_prevue_mm', sa.Float(), nullable=True))
+    op.add_column('irrigation_records', sa.Column('meteo_updated_at', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_irrigation_records_weather_cell'), 'irrigation_records', ['weather_cell'], unique=False)
+    op.create_table(
+        'scheduler_locks',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('owner', sa.String(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('scheduler_locks')
+    op.drop_index(op.f('ix_irrigation_records_weather_cell'), table_name='irrigation_records')
+    with op.batch_alter_table('irrigation_records') as batch_op:
+        batch_op.drop_column('meteo_updated_at')
+        batch_op.drop_column('pluie_prevue_mm')
+        batch_op.drop_column('weather_cell')
+        batch_op.drop_column('longitude')
+        batch_op.drop_column('latitude')
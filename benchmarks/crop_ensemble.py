@@ -0,0 +1,74 @@
+"""
+Micro-benchmark de l'ensemble de recommandation de cultures.
+
+Usage (depuis la racine du projet) :
+    python -m benchmarks.crop_ensemble --calls 2000 --batch 1000
+
+Compare la latence par appel de l'ancien chemin (chaque membre normalise l'entrée
+puis prédit, vote avec Counter) avec le nouvel ensemble (normalisation partagée),
+en séquentiel ou sur un pool de threads, en vote hard ou soft.
+"""
+import argparse
+import time
+from collections import Counter
+
+import numpy as np
+
+from ai.RecCultures.recommanders import MultiModelBasedRecommender, lr_model, nb_model, svm_model
+
+
+def legacy_predict(models, x):
+    predictions = [m(x) for m in models]
+    return Counter(predictions).most_common(1)[0][0]
+
+
+def timed(fn, inputs):
+    latencies = []
+    for x in inputs:
+        start = time.perf_counter()
+        fn(x)
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1e6
+    return np.mean(latencies), np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=1000, help="Taille du lot pour predict_many")
+    args = parser.parse_args()
+
+    models = (lr_model, nb_model, svm_model)
+    scaler = lr_model.scaler
+    rng = np.random.default_rng(0)
+    X = rng.normal(scaler.mean_, scaler.scale_, size=(max(args.calls, args.batch), len(scaler.mean_)))
+    samples = [list(x) for x in X[:args.calls]]
+
+    variants = {
+        "legacy (3 scalings + Counter)": lambda x: legacy_predict(models, x),
+        "partagé, hard": MultiModelBasedRecommender(*models).predict,
+        "partagé, hard, threads": MultiModelBasedRecommender(*models, parallel=True).predict,
+        "partagé, soft": MultiModelBasedRecommender(*models, voting="soft").predict,
+    }
+
+    print(f"{'variante':<32} {'moy µs':>9} {'p50 µs':>9} {'p99 µs':>9}")
+    for name, predict in variants.items():
+        for x in samples[:50]:
+            predict(x)
+        mean, p50, p99 = timed(predict, samples)
+        print(f"{name:<32} {mean:>9.1f} {p50:>9.1f} {p99:>9.1f}")
+
+    batch = X[:args.batch]
+    start = time.perf_counter()
+    for x in batch:
+        legacy_predict(models, list(x))
+    legacy_time = time.perf_counter() - start
+    start = time.perf_counter()
+    MultiModelBasedRecommender(*models).predict_many(batch)
+    batch_time = time.perf_counter() - start
+    print(f"\n{args.batch} lignes : legacy {legacy_time * 1000:.1f} ms, predict_many {batch_time * 1000:.1f} ms "
+          f"(x{legacy_time / batch_time:.0f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Parité de précision et benchmark des backends CPU du modèle de détection de maladies.
+
+Usage (depuis la racine du projet) :
+    python -m benchmarks.disease_backends --images storage/uploads --batch-size 8 --runs 50
+
+Pour chaque backend : accord top-1 avec le modèle eager sur les images du dossier,
+écart max des probabilités, débit (images/s) et latence p50/p99 par lot.
+"""
+import argparse
+import statistics
+import time
+
+import torch
+
+from ai.DetecMaladie.backends import BACKENDS, configure_threads, load_calibration_batch
+from ai.DetecMaladie.classifier import DiseaseClassifier
+from ai.DetecMaladie.disease_prediction import PlantDiseaseModel
+from ai.DetecMaladie.service import build_disease_model
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def as_batch(model: DiseaseClassifier, images: torch.Tensor):
+    return images if isinstance(model, PlantDiseaseModel) else images.numpy()
+
+
+def probabilities(model: DiseaseClassifier, images: torch.Tensor) -> torch.Tensor:
+    """Matrice N x 38 des probabilités, quel que soit le backend."""
+    n_classes = len(model.disease_class_labels)
+    probs = torch.zeros(len(images), n_classes)
+    for row, result in enumerate(model.predict_batch_proba(as_batch(model, images), top_k=n_classes)):
+        for item in result["top_k"]:
+            probs[row, item["class_index"]] = item["probability"]
+    return probs
+
+
+def benchmark(model: DiseaseClassifier, images: torch.Tensor, batch_size: int, runs: int, warmup: int = 3):
+    batch = images[:batch_size]
+    if len(batch) < batch_size:
+        batch = batch.repeat((batch_size + len(batch) - 1) // len(batch), 1, 1, 1)[:batch_size]
+    batch = as_batch(model, batch)
+    for _ in range(warmup):
+        model.predict_batch(batch)
+
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        model.predict_batch(batch)
+        latencies.append(time.perf_counter() - start)
+
+    return {
+        "images_per_s": batch_size * runs / sum(latencies),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default="storage/uploads", help="Dossier des images de parité")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS + ("onnx",))
+    parser.add_argument("--channels-last", action="store_true")
+    parser.add_argument("--threads", type=int, default=0, help="torch.set_num_threads (0 = défaut)")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    configure_threads(args.threads)
+    reference = PlantDiseaseModel(backend="eager")
+    images = load_calibration_batch(args.images, reference.transform, limit=256)
+    reference_probs = probabilities(reference, images)
+    reference_labels = reference_probs.argmax(dim=1)
+    print(f"{len(images)} images de parité, {torch.get_num_threads()} threads\n")
+
+    header = f"{'backend':<12} {'accord top1':>11} {'max |Δp|':>9} {'img/s':>8} {'p50 ms':>8} {'p99 ms':>8}"
+    print(header)
+    print("-" * len(header))
+    for backend in args.backends:
+        if backend == "onnx":
+            model = build_disease_model("onnx")
+        else:
+            model = PlantDiseaseModel(backend=backend, channels_last=args.channels_last)
+        try:
+            probs = probabilities(model, images)
+        except Exception as e:
+            print(f"{backend:<12} indisponible : {e}")
+            continue
+        agreement = (probs.argmax(dim=1) == reference_labels).float().mean().item()
+        max_delta = (probs - reference_probs).abs().max().item()
+        stats = benchmark(model, images, args.batch_size, args.runs)
+        print(f"{backend:<12} {agreement:>10.1%} {max_delta:>9.4f} {stats['images_per_s']:>8.1f} "
+              f"{stats['p50_ms']:>8.1f} {stats['p99_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Listes longues : objets ORM + modèles Pydantic + json, vs colonnes projetées + dicts + orjson.
+
+Usage (depuis la racine du projet) :
+    python -m benchmarks.list_serialization --rows 10000 --repeat 5
+
+Remplit une base SQLite temporaire (parcelles et prédictions d'un même utilisateur)
+puis mesure, pour chaque liste, lecture + mise en forme + rendu du corps HTTP :
+- ancien chemin : query ORM, format_parcelle / from_orm_custom (base_url recalculée
+  à chaque ligne), validation response_model + jsonable_encoder, JSONResponse ;
+- nouveau chemin : select des seules colonnes utiles, dicts, ORJSONResponse.
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+
+from DB.database import Base, create_db_engine
+from DB.models import (
+    ImagePrediction, ParcelleNote, UserDB, ParcelleNoteFormattedResponse, PARCELLE_COLUMNS,
+    format_parcelle, parcelle_fields
+)
+from endpoint.disease import (
+    ImagePredictionOutput, PREDICTION_COLUMNS, disease_model, image_url_prefix, prediction_fields
+)
+
+
+def legacy_prediction(pred, request: Request) -> ImagePredictionOutput:
+    # Ancien ImagePredictionOutput.from_orm_custom
+    base_url = str(request.base_url).rstrip("/")
+    return ImagePredictionOutput(
+        id=pred.id,
+        filename=pred.filename,
+        prediction=pred.prediction,
+        confidence=pred.confidence,
+        top_k=disease_model.decode_top_k(pred.top_k),
+        file_path=pred.file_path,
+        timestamp=pred.timestamp,
+        plant=pred.plant,
+        disease=pred.disease,
+        recommended_matiere=pred.recommended_matiere,
+        critere_gravite=pred.critere_gravite,
+        critere_stade=pred.critere_stade,
+        critere_dar=pred.critere_dar,
+        image_url=f"{base_url}/disease/image/{pred.file_path}"
+    )
+
+
+def fill(engine, rows: int) -> int:
+    now = datetime.now(timezone.utc)
+    with engine.begin() as connection:
+        user_id = connection.execute(insert(UserDB).values(
+            nom="bench", prenom="bench", adresse="-", tel="0600000000",
+            email="bench@example.com", hashed_password="-")).inserted_primary_key[0]
+        connection.execute(insert(ParcelleNote), [{
+            "user_id": user_id, "nom_ferme": "Ferme Beni Mellal", "numero_parcelle": f"P-{i}",
+            "superficie": 2.5, "type_sol": "Argileux", "culture": "Blé", "date_semis": "2025-11-01",
+            "quantite_semence": 180.0, "systeme_irrigation": "Goutte à goutte",
+            "suivi_culture": "Désherbage, fertilisation azotée", "date_recolte": "2026-06-15",
+            "nombre_travailleurs": 4, "depenses": 12500.0, "rendement": 3.2,
+            "autres_infos": None, "date_creation": now,
+        } for i in range(rows)])
+        connection.execute(insert(ImagePrediction), [{
+            "user_id": user_id, "filename": f"feuille_{i}.jpg", "prediction": "Tomato___Early_blight",
+            "confidence": 0.9312, "top_k": "29:0.9312,30:0.0401,37:0.0120", "file_path": f"{i:064x}.jpg",
+            "timestamp": now,
+        } for i in range(rows)])
+    return user_id
+
+
+def make_request() -> Request:
+    return Request({
+        "type": "http", "method": "GET", "scheme": "https", "server": ("api.example.com", 443),
+        "path": "/disease/image-predictions/", "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"api.example.com")],
+    })
+
+
+async def legacy_parcelles(db: Session, user_id: int, field):
+    parcelles = db.query(ParcelleNote).filter(ParcelleNote.user_id == user_id).all()
+    content = await serialize_response(field=field, response_content=[format_parcelle(p) for p in parcelles])
+    return JSONResponse(content).body
+
+
+async def projected_parcelles(db: Session, user_id: int, field):
+    rows = db.execute(select(*PARCELLE_COLUMNS).where(ParcelleNote.user_id == user_id)).all()
+    return ORJSONResponse([parcelle_fields(row) for row in rows]).body
+
+
+async def legacy_predictions(db: Session, user_id: int, request: Request):
+    predictions = db.query(ImagePrediction).filter(ImagePrediction.user_id == user_id).all()
+    content = await serialize_response(response_content=[legacy_prediction(p, request) for p in predictions])
+    return JSONResponse(content).body
+
+
+async def projected_predictions(db: Session, user_id: int, request: Request):
+    rows = db.execute(select(*PREDICTION_COLUMNS).where(ImagePrediction.user_id == user_id)).all()
+    image_prefix = image_url_prefix(request)
+    return ORJSONResponse([prediction_fields(row, image_prefix) for row in rows]).body
+
+
+def measure(engine, listing, user_id, argument, repeat: int):
+    timings, size = [], 0
+    for _ in range(repeat):
+        # Session neuve à chaque tour, comme une requête
+        with Session(engine) as db:
+            start = time.perf_counter()
+            body = asyncio.run(listing(db, user_id, argument))
+            timings.append(time.perf_counter() - start)
+        size = len(body)
+    return statistics.median(timings) * 1000, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        Base.metadata.create_all(engine)
+        user_id = fill(engine, args.rows)
+        parcelle_field = create_response_field(name="parcelles", type_=List[ParcelleNoteFormattedResponse])
+        request = make_request()
+
+        variants = [
+            ("parcelles, ORM + Pydantic + json", legacy_parcelles, parcelle_field),
+            ("parcelles, colonnes + orjson", projected_parcelles, parcelle_field),
+            ("prédictions, ORM + Pydantic + json", legacy_predictions, request),
+            ("prédictions, colonnes + orjson", projected_predictions, request),
+        ]
+        print(f"{'liste':<36} {'ms (médiane)':>13} {'lignes/s':>10} {'octets':>10}")
+        for name, listing, argument in variants:
+            elapsed_ms, size = measure(engine, listing, user_id, argument, args.repeat)
+            print(f"{name:<36} {elapsed_ms:>13.1f} {args.rows / elapsed_ms * 1000:>10.0f} {size:>10}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Débit de login sous concurrence : bcrypt sur l'event loop vs pool borné (security.PasswordPool).
+
+Usage (depuis la racine du projet) :
+    python -m benchmarks.login_throughput --logins 64 --concurrency 16
+
+Chaque "login" vérifie un mot de passe bcrypt. En parallèle, une tâche témoin
+mesure le retard de l'event loop (ce que subissent toutes les autres requêtes
+du worker) : avec bcrypt sur l'event loop, ce retard atteint la durée d'un hash.
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+from fastapi import HTTPException
+
+from security import PasswordPool, hash_password, verify_password
+
+
+async def inline_login(password, hashed):
+    # Ancien chemin : appel synchrone dans un handler async
+    return verify_password(password, hashed)
+
+
+async def heartbeat(stop: asyncio.Event, lags: list, period: float = 0.01):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + period
+        await asyncio.sleep(period)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+async def run(login, logins: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    rejected = 0
+
+    async def one():
+        nonlocal rejected
+        async with semaphore:
+            try:
+                await login()
+            except HTTPException:
+                rejected += 1
+
+    stop, lags = asyncio.Event(), []
+    watcher = asyncio.create_task(heartbeat(stop, lags))
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await watcher
+    lags = np.array(lags or [0.0]) * 1000
+    return logins / elapsed, np.percentile(lags, 50), np.percentile(lags, 99), lags.max(), rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=None, help="Threads du pool (défaut : PASSWORD_WORKERS)")
+    parser.add_argument("--max-pending", type=int, default=None, help="File maximale (défaut : PASSWORD_MAX_PENDING)")
+    args = parser.parse_args()
+
+    password = "mot-de-passe"
+    hashed = hash_password(password)
+    pool_kwargs = {k: v for k, v in (("workers", args.workers), ("max_pending", args.max_pending)) if v is not None}
+    pool = PasswordPool(**pool_kwargs)
+
+    variants = {
+        "bcrypt sur l'event loop": lambda: inline_login(password, hashed),
+        f"pool ({pool.workers} threads, file {pool.max_pending})": lambda: pool.run(verify_password, password, hashed),
+    }
+
+    print(f"{'variante':<36} {'logins/s':>9} {'lag p50 ms':>11} {'lag p99 ms':>11} {'lag max ms':>11} {'429':>5}")
+    for name, login in variants.items():
+        throughput, p50, p99, worst, rejected = asyncio.run(run(login, args.logins, args.concurrency))
+        print(f"{name:<36} {throughput:>9.1f} {p50:>11.1f} {p99:>11.1f} {worst:>11.1f} {rejected:>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,140 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from fastapi.responses import JSONResponse
-import json
-import os
+import bisect
+import hashlib
+import re
+import unicodedata
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
 
-from DB.database import get_session
-from security import get_current_user
-from DB.models import UserDB
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+
+from DB.reference import ReferenceCache, reference_key
+from security import get_current_user, UserSnapshot
+from DB.models import CatalogueReference, ReferenceImport
 
 router = APIRouter()
 
-# Emplacement du fichier JSON
-CHEMIN_JSON = "storage/catalogue_complet.json"
+MAX_PAGE_SIZE = 200
+
+def _tokens(text: str) -> list:
+    """Mots sans accents ni casse ("Graines d’Oignon" -> ["graines", "d", "oignon"])."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    without_accents = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return re.findall(r"\w+", without_accents.casefold())
+
+
+class CatalogueIndex:
+    """
+    Un catalogue en mémoire : produits dans l'ordre du fichier source et index inversé
+    des mots de `nom` / `description` pour la recherche.
+    """
+
+    def __init__(self, catalogue: CatalogueReference):
+        self.nom = catalogue.nom
+        self.liens_sites = catalogue.liens_sites or []
+        self.produits = [
+            {"nom": p.nom, "description": p.description, "image": p.image}
+            for p in catalogue.produits
+        ]
+        postings = {}
+        for position, produit in enumerate(self.produits):
+            for token in set(_tokens(produit["nom"]) + _tokens(produit["description"])):
+                postings.setdefault(token, []).append(position)
+        self._postings = postings
+        self._vocabulary = sorted(postings)
+
+    def _prefix_matches(self, prefix: str) -> set:
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        matches = set()
+        for token in self._vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            matches.update(self._postings[token])
+        return matches
+
+    def search(self, q: Optional[str]) -> list:
+        """Positions des produits contenant tous les mots de `q` (en début de mot) ; tous si `q` est vide."""
+        terms = _tokens(q) if q else []
+        if not terms:
+            return list(range(len(self.produits)))
+        positions = None
+        for term in terms:
+            matches = self._prefix_matches(term)
+            positions = matches if positions is None else positions & matches
+            if not positions:
+                return []
+        return sorted(positions)
+
+
+def _load_index(db: Session) -> dict:
+    catalogues = db.scalars(
+        select(CatalogueReference).options(selectinload(CatalogueReference.produits))
+    ).all()
+    imported = db.get(ReferenceImport, "catalogues")
+    last_modified = imported.imported_at if imported is not None else None
+    if last_modified is not None and last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return {
+        "catalogues": {c.nom_key: CatalogueIndex(c) for c in catalogues},
+        "version": imported.sha256 if imported is not None else "",
+        "last_modified": last_modified.replace(microsecond=0) if last_modified is not None else None,
+    }
+
+
+# Catalogues lus dans ref_catalogues / ref_produits (voir `python -m DB.import_reference`)
+catalogue_cache = ReferenceCache("catalogues", _load_index)
+
+
+def _not_modified(request: Request, etag: str, last_modified) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            return last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
 
 @router.get("/catalogue/{nom_catalogue}")
 def lire_catalogue(
     nom_catalogue: str,
-    db: Session = Depends(get_session),
-    user: UserDB = Depends(get_current_user)  # Authentification sécurisée
+    request: Request,
+    response: Response,
+    q: Optional[str] = Query(None, description="Recherche dans le nom et la description des produits"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    user: UserSnapshot = Depends(get_current_user)  # Authentification sécurisée
 ):
-    if not os.path.exists(CHEMIN_JSON):
-        raise HTTPException(status_code=500, detail="Fichier catalogue non trouvé")
-
-    try:
-        with open(CHEMIN_JSON, "r", encoding="utf-8") as fichier:
-            data = json.load(fichier)
-
-        for catalogue in data:
-            if catalogue["catalogue"].lower() == nom_catalogue.lower():
-                return {
-                    "catalogue": catalogue["catalogue"],
-                    "liens_sites": catalogue.get("liens_sites", []),
-                    "produits": catalogue.get("produits", [])
-                }
-
+    index = catalogue_cache.get()
+    catalogue = index["catalogues"].get(reference_key(nom_catalogue))
+    if catalogue is None:
         raise HTTPException(status_code=404, detail="Catalogue introuvable")
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+    # La réponse ne dépend que de l'import courant et des paramètres de la requête
+    fingerprint = f"{index['version']}|{reference_key(nom_catalogue)}|{q or ''}|{page}|{page_size}"
+    etag = '"' + hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:32] + '"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if index["last_modified"] is not None:
+        headers["Last-Modified"] = format_datetime(index["last_modified"], usegmt=True)
+    if _not_modified(request, etag, index["last_modified"]):
+        return Response(status_code=304, headers=headers)
+
+    positions = catalogue.search(q)
+    start = (page - 1) * page_size
+    total = len(positions)
+    body = {
+        "catalogue": catalogue.nom,
+        "liens_sites": catalogue.liens_sites,
+        "produits": [catalogue.produits[i] for i in positions[start:start + page_size]],
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "pages": (total + page_size - 1) // page_size,
+    }
+    response.headers.update(headers)
+    return body
@@ -5,14 +5,19 @@ from gtts import gTTS
 import speech_recognition as sr
 import uuid
 import os
+import tempfile
 from pydub import AudioSegment
-import io
 from datetime import datetime
-from sqlalchemy.orm import Session
+from typing import Optional
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from config import env
-from DB.database import get_session
-from DB.models import ChatbotInteraction, UserDB  # <-- assure-toi que ce modèle est bien dans DB.models
-from security import get_current_user     # <-- pour récupérer l'utilisateur connecté
+from DB.database import get_async_session
+from DB.models import ChatbotInteraction  # <-- assure-toi que ce modèle est bien dans DB.models
+from pagination import Page, PageParams
+from uploads import save_upload, discard, AUDIO_KINDS, MAX_AUDIO_BYTES
+from security import get_current_user, get_current_user_id, UserSnapshot     # <-- pour récupérer l'utilisateur connecté
 
 API_KEY = env("GEMINI_API_KEY")
 configure(api_key=API_KEY)
@@ -40,8 +45,8 @@ from fastapi import Request
 async def chat_text(
     message: str = Form(None),
     lang: str = Form("ar"),
-    db: Session = Depends(get_session),
-    current_user: UserDB = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_session),
+    current_user: UserSnapshot = Depends(get_current_user),
 ):
     print("📥 Reçu dans /chat/text:")
     print(f"message: {message}")
@@ -68,7 +73,7 @@ async def chat_text(
             timestamp=datetime.utcnow()
         )
         db.add(interaction)
-        db.commit()
+        await db.commit()
 
         return {"response": response_text}
     except Exception as e:
@@ -82,23 +87,32 @@ async def chat_text(
 async def chat_audio(
     file: UploadFile = File(...),
     lang: str = Form("ar"),
-    db: Session = Depends(get_session),
-    current_user: UserDB = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_session),
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
+    # Note vocale copiée par blocs sur disque (type vérifié, taille plafonnée) : ffmpeg lit le fichier
+    stored = await save_upload(
+        file, tempfile.gettempdir(),
+        max_bytes=MAX_AUDIO_BYTES,
+        kinds=AUDIO_KINDS,
+        name=f"upload_{uuid.uuid4()}",
+        unsupported_detail="Format audio non supporté",
+    )
     try:
-        file_content = await file.read()
-        print(f"📥 Fichier reçu: {file.filename}, taille: {len(file_content)} octets")
+        print(f"📥 Fichier reçu: {file.filename}, taille: {stored.size} octets")
 
         # ➕ Ajouter cette ligne pour détecter l’extension :
         extension = file.filename.split(".")[-1].lower()
 
         # ✅ Lire l’audio avec le bon format automatiquement
-        audio = AudioSegment.from_file(io.BytesIO(file_content), format=extension)
+        audio = AudioSegment.from_file(stored.path, format=extension)
 
         wav_path = f"temp_{uuid.uuid4()}.wav"
         audio.export(wav_path, format="wav")
     except Exception as e:
         raise HTTPException(400, f"Erreur conversion: {str(e)}")
+    finally:
+        discard(stored)
 
     recognizer = sr.Recognizer()
     try:
@@ -130,7 +144,7 @@ async def chat_audio(
             timestamp=datetime.utcnow()
         )
         db.add(interaction)
-        db.commit()
+        await db.commit()
 
         return {
             "text": response_text,
@@ -154,4 +168,28 @@ async def debug_audio_folder():
         "path": AUDIO_FOLDER,
         "exists": os.path.exists(AUDIO_FOLDER),
         "files": os.listdir(AUDIO_FOLDER) if os.path.exists(AUDIO_FOLDER)else[]
-}
\ No newline at end of file
+}
+
+
+class ChatbotInteractionOutput(BaseModel):
+    id: int
+    input_type: Optional[str] = None
+    user_input: Optional[str] = None
+    bot_response: Optional[str] = None
+    audio_filename: Optional[str] = None
+    timestamp: datetime
+
+    class Config:
+        orm_mode = True
+
+
+@router.get("/history", response_model=Page[ChatbotInteractionOutput])
+async def chat_history(
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_session),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Conversations de l'utilisateur, de la plus récente à la plus ancienne."""
+    stmt = page.apply(select(ChatbotInteraction).where(ChatbotInteraction.user_id == user_id), ChatbotInteraction.id)
+    interactions, next_cursor = page.page((await db.scalars(stmt)).all())
+    return {"items": interactions, "next_cursor": next_cursor}
@@ -1,18 +1,21 @@
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
-import shutil
-import os
-import uuid
 
-from DB.models import ParcelleNote, UserDB, format_parcelle, ParcelleNoteFormattedResponse
-from DB.database import get_session
-from security import get_current_user
+from DB.models import ParcelleNote, format_parcelle, ParcelleNoteFormattedResponse, PARCELLE_COLUMNS, parcelle_fields
+from DB.database import get_async_session, get_session
+from security import get_current_user, get_current_user_id, UserSnapshot
+from uploads import save_upload, IMAGE_KINDS, MAX_PLANT_IMAGE_BYTES
 from pydantic import BaseModel
 
 router = APIRouter()
 
+PARCELLE_STORAGE = "storage/uploads"
+
 
 class ParcelleNoteResponse(BaseModel):
     id: int
@@ -54,16 +57,19 @@ async def create_parcelle(
     depenses: float = Form(...),
     rendement: float = Form(...),
     autres_infos: Optional[str] = Form(None),
-    session: Session = Depends(get_session),
-    user: UserDB = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+    user: UserSnapshot = Depends(get_current_user),
 ):
     image_path = None
     if image:
-        os.makedirs("storage/uploads", exist_ok=True)
-        unique_filename = f"{uuid.uuid4().hex}_{image.filename}"
-        image_path = f"storage/uploads/{unique_filename}"
-        with open(image_path, "wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
+        # Copie par blocs, type reconnu sur les premiers octets, taille plafonnée, nommée par son sha256
+        stored = await save_upload(
+            image, PARCELLE_STORAGE,
+            max_bytes=MAX_PLANT_IMAGE_BYTES,
+            kinds=IMAGE_KINDS,
+            unsupported_detail="Format d'image non supporté",
+        )
+        image_path = stored.path
 
     parcelle = ParcelleNote(
         user_id=user.id,
@@ -85,8 +91,7 @@ async def create_parcelle(
         date_creation=datetime.utcnow(),
     )
     session.add(parcelle)
-    session.commit()
-    session.refresh(parcelle)
+    await session.commit()  # id lisible après commit (expire_on_commit=False), sans refresh
     return parcelle
 
 
@@ -95,17 +100,20 @@ def read_parcelles(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_session),
-    current_user=Depends(get_current_user),
+    user_id: int = Depends(get_current_user_id),
 ):
-    parcelles = db.query(ParcelleNote).filter(ParcelleNote.user_id == current_user.id).offset(skip).limit(limit).all()
-    return [format_parcelle(p) for p in parcelles]
+    rows = db.execute(
+        select(*PARCELLE_COLUMNS).where(ParcelleNote.user_id == user_id).offset(skip).limit(limit)
+    ).all()
+    # Lignes -> dicts -> orjson, sans passer par les modèles Pydantic ni jsonable_encoder
+    return ORJSONResponse([parcelle_fields(row) for row in rows])
 
 
 @router.get("/{parcelle_id}", response_model=ParcelleNoteFormattedResponse)
 def read_parcelle(
     parcelle_id: int,
     db: Session = Depends(get_session),
-    current_user=Depends(get_current_user),
+    current_user: UserSnapshot = Depends(get_current_user),
 ):
     parcelle = db.query(ParcelleNote).filter(
         ParcelleNote.id == parcelle_id,
@@ -136,7 +144,7 @@ def update_parcelle(
     rendement: float = Form(...),
     autres_infos: Optional[str] = Form(None),
     db: Session = Depends(get_session),
-    user: UserDB = Depends(get_current_user),
+    user: UserSnapshot = Depends(get_current_user),
 ):
     parcelle = db.query(ParcelleNote).filter(
         ParcelleNote.id == parcelle_id,
@@ -178,7 +186,7 @@ def update_parcelle(
 def delete_parcelle(
     parcelle_id: int,
     db: Session = Depends(get_session),
-    current_user=Depends(get_current_user),
+    current_user: UserSnapshot = Depends(get_current_user),
 ):
     parcelle = db.query(ParcelleNote).filter(
         ParcelleNote.id == parcelle_id,
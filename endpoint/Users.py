@@ -1,17 +1,36 @@
 
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, status
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
-import os
-import imghdr
 import re
-from DB.database import get_session
+from DB.database import get_async_session
 from DB.models import UserDB
-from security import hash_password, verify_password, create_token, get_current_user
+from uploads import save_upload, MAX_PROFILE_IMAGE_BYTES
+from security import hash_password_async, verify_password_async, create_token, get_current_user, get_current_user_db, auth_cache, UserSnapshot
 
 router = APIRouter()
 
+USER_IMAGE_FOLDER = "user_images"
+PROFILE_IMAGE_KINDS = ("jpeg", "png", "gif", "bmp")
+
+
+def _safe_email(email: str) -> str:
+    return email.replace("@", "_at_").replace(".", "_dot_")
+
+
+async def _save_profile_image(image: UploadFile, email: str) -> str:
+    # Copie par blocs, type reconnu sur les premiers octets, taille plafonnée
+    stored = await save_upload(
+        image, USER_IMAGE_FOLDER,
+        max_bytes=MAX_PROFILE_IMAGE_BYTES,
+        kinds=PROFILE_IMAGE_KINDS,
+        name=_safe_email(email),
+        unsupported_detail="Format d'image non supporté",
+    )
+    return stored.path
+
 # Validation téléphone marocain
 def validate_tel(tel: str) -> str:
     pattern = r"^0[5-7][0-9]{8}$"
@@ -28,38 +47,22 @@ async def register(
     password: str = Form(...),
     tel: str = Form(...),
     image: Optional[UploadFile] = File(None),
-    db: Session = Depends(get_session)
+    db: AsyncSession = Depends(get_async_session)
 ):
     # Validation téléphone
     validate_tel(tel)
 
     # Vérifier si email existe déjà
-    if db.query(UserDB).filter(UserDB.email == email).first():
+    if await db.scalar(select(UserDB.id).where(UserDB.email == email)):
         raise HTTPException(status_code=400, detail="Email déjà utilisé")
 
     # Hasher le mot de passe
-    hashed_pw = hash_password(password)
+    hashed_pw = await hash_password_async(password)
 
     # Gérer upload image
     image_path = None
     if image:
-        image_bytes = await image.read()
-        image_type = imghdr.what(None, h=image_bytes)
-        if image_type not in ("jpeg", "png", "gif", "bmp"):
-            raise HTTPException(status_code=400, detail="Format d'image non supporté")
-
-        image_folder = "user_images"
-        os.makedirs(image_folder, exist_ok=True)
-
-        _, ext = os.path.splitext(image.filename)
-        ext = ext.lower()
-        safe_email = email.replace("@", "_at_").replace(".", "_dot_")
-        safe_filename = f"{safe_email}{ext}"
-
-        image_path = os.path.join(image_folder, safe_filename)
-
-        with open(image_path, "wb") as f:
-            f.write(image_bytes)
+        image_path = await _save_profile_image(image, email)
 
     # Créer utilisateur en DB
     new_user = UserDB(
@@ -72,8 +75,7 @@ async def register(
         image=image_path
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
 
     return JSONResponse(status_code=status.HTTP_201_CREATED, content={"message": "Utilisateur inscrit avec succès"})
 
@@ -81,11 +83,11 @@ async def register(
 async def login(
     email: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_session)
+    db: AsyncSession = Depends(get_async_session)
 ):
-    user = db.query(UserDB).filter(UserDB.email == email).first()
+    user = await db.scalar(select(UserDB).where(UserDB.email == email))
 
-    if not user or not verify_password(password, user.hashed_password):
+    if not user or not await verify_password_async(password, user.hashed_password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Identifiants incorrects")
 
     token = create_token({"sub": user.email})
@@ -106,7 +108,7 @@ async def login(
 
 # Récupérer l'utilisateur connecté via token JWT
 @router.get("/me")
-def get_me(current_user: UserDB = Depends(get_current_user)):
+def get_me(current_user: UserSnapshot = Depends(get_current_user)):
     return {
         "id": current_user.id,
         "nom": current_user.nom,
@@ -124,8 +126,8 @@ async def update_profile(
     tel: Optional[str] = Form(None),
     password: Optional[str] = Form(None),
     image: Optional[UploadFile] = File(None),
-    db: Session = Depends(get_session),
-    current_user: UserDB = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_session),
+    current_user: UserDB = Depends(get_current_user_db)
 ):
     if tel:
         validate_tel(tel)
@@ -141,30 +143,14 @@ async def update_profile(
 
     # Modifier mot de passe
     if password:
-        current_user.hashed_password = hash_password(password)
+        current_user.hashed_password = await hash_password_async(password)
 
     # Modifier l'image
     if image:
-        image_bytes = await image.read()
-        image_type = imghdr.what(None, h=image_bytes)
-        if image_type not in ("jpeg", "png", "gif", "bmp"):
-            raise HTTPException(status_code=400, detail="Format d'image non supporté")
-
-        image_folder = "user_images"
-        os.makedirs(image_folder, exist_ok=True)
-        _, ext = os.path.splitext(image.filename)
-        ext = ext.lower()
-        safe_email = current_user.email.replace("@", "_at_").replace(".", "_dot_")
-        safe_filename = f"{safe_email}{ext}"
-        image_path = os.path.join(image_folder, safe_filename)
-
-        with open(image_path, "wb") as f:
-            f.write(image_bytes)
-
-        current_user.image = image_path
+        current_user.image = await _save_profile_image(image, current_user.email)
 
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    auth_cache.invalidate(current_user.email)
 
     return {
         "message": "Profil mis à jour avec succès",
@@ -180,10 +166,11 @@ async def update_profile(
     }
 
 @router.delete("/delete-account")
-def delete_account(
-    db: Session = Depends(get_session),
-    current_user: UserDB = Depends(get_current_user)
+async def delete_account(
+    db: AsyncSession = Depends(get_async_session),
+    current_user: UserDB = Depends(get_current_user_db)
 ):
-    db.delete(current_user)
-    db.commit()
+    await db.delete(current_user)
+    await db.commit()
+    auth_cache.invalidate(current_user.email)
     return {"message": "Compte supprimé avec succès"}
@@ -1,95 +1,263 @@
+import asyncio
 import datetime
 import json
+import os
+import threading
+import zipfile
 from pathlib import Path
-from uuid import uuid4
-from PIL import Image
+from typing import List, Optional
 from fastapi import UploadFile, File, HTTPException, Depends, Form, APIRouter, Request
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse, ORJSONResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-
-from ai.DetecMaladie.disease_prediction import PlantDiseaseModel
-from DB.database import get_session
-from DB.models import ImagePrediction, UserDB
-from security import get_current_user
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ai.DetecMaladie.service import disease_model
+from ai.DetecMaladie.batching import disease_batcher, MAX_BATCH_SIZE
+from ai.DetecMaladie.prediction_cache import prediction_cache, content_hash, perceptual_hash
+from ai.DetecMaladie.treatments import treatment_index, split_prediction
+from config import env
+from DB.database import get_async_session
+from DB.models import ImagePrediction
+from pagination import Page, PageParams
+from security import get_current_user, get_current_user_id, UserSnapshot
+from uploads import save_upload, save_bytes, check_kind, IMAGE_KINDS, MAX_PLANT_IMAGE_BYTES
 
 router = APIRouter()
 
+MAX_FILES_PER_BATCH = int(env("DISEASE_MAX_FILES_PER_BATCH", 500))
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".gif", ".webp")
+# En dessous de ce seuil, le label n'est pas jugé fiable pour recommander un traitement
+CONFIDENCE_THRESHOLD = float(env("DISEASE_CONFIDENCE_THRESHOLD", 0.5))
+PLANT_STORAGE = "storage/plants"
+
+
+def _prediction_payload(result: dict) -> dict:
+    return {
+        "predicted_disease": result["label"],
+        "confidence": round(result["confidence"], 4),
+        "low_confidence": result["confidence"] < CONFIDENCE_THRESHOLD,
+        "top_k": [
+            {"label": item["label"], "probability": round(item["probability"], 4)}
+            for item in result["top_k"]
+        ]
+    }
+
+
+def _prepare_upload(source, digest: str):
+    """Hash exact, puis hash perceptuel ; l'image n'est prétraitée qu'en cas de défaut de cache."""
+    cached = prediction_cache.get_exact(digest)
+    if cached is not None:
+        return None, cached, None
+
+    image = disease_model.decode(source)
+    phash = perceptual_hash(image)
+    cached = prediction_cache.get_similar(phash)
+    if cached is not None:
+        return phash, cached, None
+    return phash, None, disease_model.preprocess(image)
+
+
+async def _predict_upload(source, digest: str):
+    """`source` : octets de l'image ou chemin du fichier reçu ; `digest` : son sha256. Renvoie (résultat, cache_hit)."""
+    phash, cached, image_tensor = await run_in_threadpool(_prepare_upload, source, digest)
+    if cached is not None:
+        return cached, True
+    result = await disease_batcher.predict(image_tensor)
+    prediction_cache.put(digest, phash, result)
+    return result, False
+
 
 @router.post("/predict-disease/")
 async def predict_disease(
     file: UploadFile = File(...),
-    session: Session = Depends(get_session),
-    user: UserDB = Depends(get_current_user)
+    session: AsyncSession = Depends(get_async_session),
+    user: UserSnapshot = Depends(get_current_user)
 ):
     try:
-        Path("./storage/plants").mkdir(parents=True, exist_ok=True)
-
-        file_name = f"{uuid4()}.jpg"
-        file_location = f"storage/plants/{file_name}"
-
-        with open(file_location, "wb") as buffer:
-            buffer.write(file.file.read())
-
-        image = Image.open(file_location).convert("RGB")
-        model = PlantDiseaseModel()
-        predicted_disease = model.predict(image)
+        # Upload copié par blocs dans le stockage (nommé par son sha256), puis décodé depuis le fichier
+        stored = await save_upload(
+            file, PLANT_STORAGE,
+            max_bytes=MAX_PLANT_IMAGE_BYTES,
+            kinds=IMAGE_KINDS,
+            unsupported_detail="Format d'image non supporté",
+        )
+        result, cache_hit = await _predict_upload(stored.path, stored.sha256)
+        file_name = os.path.basename(stored.path)
 
         image_prediction = ImagePrediction(
             filename=file.filename,
-            prediction=predicted_disease,
+            prediction=result["label"],
+            confidence=result["confidence"],
+            top_k=disease_model.encode_top_k(result["top_k"]),
             file_path=file_name,
             user_id=user.id
         )
         session.add(image_prediction)
-        session.commit()
-        session.refresh(image_prediction)
+        await session.commit()
 
         return {
             "prediction_id": image_prediction.id,
-            "predicted_disease": predicted_disease
+            **_prediction_payload(result),
+            "cache_hit": cache_hit
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+IMAGE_TOO_LARGE = f"Image trop volumineuse (maximum {MAX_PLANT_IMAGE_BYTES / (1024 * 1024):g} Mo)"
+
+
+def _bounded_read(file_obj) -> bytes:
+    """Lit au plus MAX_PLANT_IMAGE_BYTES (+1 octet pour détecter le dépassement)."""
+    data = file_obj.read(MAX_PLANT_IMAGE_BYTES + 1)
+    if len(data) > MAX_PLANT_IMAGE_BYTES:
+        raise ValueError(IMAGE_TOO_LARGE)
+    return data
+
+
+def _collect_batch_sources(files: Optional[List[UploadFile]], archive: Optional[UploadFile]):
+    """
+    Retourne la liste (nom, lecteur) des images envoyées, fichiers séparés et/ou archive zip.
+    Chaque lecteur est plafonné à MAX_PLANT_IMAGE_BYTES : une image trop lourde (ou un membre
+    de zip qui se décompresse en un fichier énorme) produit une erreur pour cette image seulement.
+    """
+    sources = [(f.filename, lambda f=f: _bounded_read(f.file)) for f in files or []]
+
+    if archive is not None:
+        try:
+            zip_file = zipfile.ZipFile(archive.file)
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=400, detail="Archive zip invalide")
+        zip_lock = threading.Lock()
+
+        def reader(info):
+            def read():
+                # Taille annoncée vérifiée avant toute décompression, lecture bornée ensuite
+                if info.file_size > MAX_PLANT_IMAGE_BYTES:
+                    raise ValueError(IMAGE_TOO_LARGE)
+                with zip_lock, zip_file.open(info) as member:
+                    return _bounded_read(member)
+            return read
+
+        sources.extend(
+            (Path(info.filename).name, reader(info))
+            for info in zip_file.infolist()
+            if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS)
+            and not Path(info.filename).name.startswith(".")
+        )
+
+    if not sources:
+        raise HTTPException(status_code=400, detail="Aucune image fournie")
+    if len(sources) > MAX_FILES_PER_BATCH:
+        raise HTTPException(status_code=413, detail=f"Maximum {MAX_FILES_PER_BATCH} images par lot")
+    return sources
+
+
+@router.post("/predict-disease/batch")
+async def predict_disease_batch(
+    files: Optional[List[UploadFile]] = File(None),
+    archive: Optional[UploadFile] = File(None),
+    session: AsyncSession = Depends(get_async_session),
+    user: UserSnapshot = Depends(get_current_user)
+):
+    """
+    Prédiction en lot : plusieurs fichiers et/ou une archive zip.
+    Les résultats sont renvoyés en NDJSON au fil de l'eau, puis toutes les
+    prédictions sont insérées en une seule transaction (dernière ligne : identifiants).
+    """
+    Path(PLANT_STORAGE).mkdir(parents=True, exist_ok=True)
+    sources = _collect_batch_sources(files, archive)
+    user_id = user.id
+    # Borne le nombre d'images décodées en mémoire en même temps
+    semaphore = asyncio.Semaphore(MAX_BATCH_SIZE * 2)
+
+    async def process(index, filename, read):
+        async with semaphore:
+            try:
+                data = await run_in_threadpool(read)
+                # Même contrôle de type et même nommage que /predict-disease/ (uploads.py)
+                kind = check_kind(data, IMAGE_KINDS)
+                digest = content_hash(data)
+                result, cache_hit = await _predict_upload(data, digest)
+                stored_path = await run_in_threadpool(save_bytes, data, PLANT_STORAGE, digest, kind)
+                file_name = os.path.basename(stored_path)
+            except Exception as e:
+                return {"index": index, "filename": filename, "error": str(e)}, None
+        row = ImagePrediction(
+            filename=filename,
+            prediction=result["label"],
+            confidence=result["confidence"],
+            top_k=disease_model.encode_top_k(result["top_k"]),
+            file_path=file_name,
+            user_id=user_id
+        )
+        line = {"index": index, "filename": filename, "file_path": file_name,
+                **_prediction_payload(result), "cache_hit": cache_hit}
+        return line, row
+
+    async def stream():
+        tasks = [asyncio.ensure_future(process(i, name, read)) for i, (name, read) in enumerate(sources)]
+        rows = {}
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                line, row = await next_done
+                if row is not None:
+                    rows[line["index"]] = row
+                yield json.dumps(line, ensure_ascii=False) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        indexes = sorted(rows)
+        predictions = [rows[i] for i in indexes]
+        session.add_all(predictions)
+        await session.commit()  # INSERT groupé ; ids toujours lisibles (expire_on_commit=False)
+        prediction_ids = [p.id for p in predictions]
+
+        yield json.dumps({
+            "done": True,
+            "total": len(sources),
+            "failed": len(sources) - len(predictions),
+            "predictions": [
+                {"index": i, "prediction_id": pid} for i, pid in zip(indexes, prediction_ids)
+            ]
+        }) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
 @router.get("/criteres-disponibles/")
 async def get_criteres_disponibles(
     prediction_id: int,
-    session: Session = Depends(get_session),
-    user: UserDB = Depends(get_current_user)
+    session: AsyncSession = Depends(get_async_session),
+    user: UserSnapshot = Depends(get_current_user)
 ):
-    prediction = session.query(ImagePrediction).filter_by(id=prediction_id, user_id=user.id).first()
+    prediction = await session.scalar(select(ImagePrediction).filter_by(id=prediction_id, user_id=user.id))
     if not prediction:
         raise HTTPException(status_code=404, detail="Prédiction non trouvée")
 
-    disease_full = prediction.prediction
-    if "___" not in disease_full:
-        raise HTTPException(status_code=400, detail="Format de prédiction invalide")
-
-    plant, disease = [part.strip().replace("_", " ") for part in disease_full.split("___")]
-
-    with open("DB/versionFinale.json", encoding="utf-8") as f:
-        all_data = json.load(f)
-
-    entries = [
-        e for e in all_data
-        if e.get("Plant") and e.get("Disease")
-        and e["Plant"].strip().lower() == plant.lower()
-        and e["Disease"].strip().lower() == disease.lower()
-    ]
+    # Diagnostic peu fiable : inutile de proposer des critères de traitement
+    if prediction.confidence is not None and prediction.confidence < CONFIDENCE_THRESHOLD:
+        return {
+            "low_confidence": True,
+            "confidence": round(prediction.confidence, 4),
+            "candidates": disease_model.decode_top_k(prediction.top_k),
+            "gravites": [],
+            "stades": [],
+            "dars": [],
+            "all_matieres": []
+        }
 
-    gravites = sorted(set(e["Gravité ciblée"] for e in entries if e.get("Gravité ciblée")))
-    stades = sorted(set(e["Stade recommandé"] for e in entries if e.get("Stade recommandé")))
-    dars = sorted(set(str(e["DAR"]).strip() for e in entries if e.get("DAR")))
+    parsed = split_prediction(prediction.prediction)
+    if parsed is None:
+        raise HTTPException(status_code=400, detail="Format de prédiction invalide")
 
-    return {
-        "gravites": gravites,
-        "stades": stades,
-        "dars": dars,
-        "all_matieres": entries
-    }
+    return {"low_confidence": False, **(await treatment_index.criteria(*parsed))}
 
 
 @router.post("/recommend-matiere/")
@@ -98,38 +266,19 @@ async def recommend_matiere(
     critere_gravite: str = Form(...),
     critere_stade: str = Form(...),
     critere_dar: str = Form(...),
-    session: Session = Depends(get_session),
-    user: UserDB = Depends(get_current_user)
+    session: AsyncSession = Depends(get_async_session),
+    user: UserSnapshot = Depends(get_current_user)
 ):
-    prediction = session.query(ImagePrediction).filter_by(id=prediction_id, user_id=user.id).first()
+    prediction = await session.scalar(select(ImagePrediction).filter_by(id=prediction_id, user_id=user.id))
     if not prediction:
         raise HTTPException(status_code=404, detail="Prédiction non trouvée")
 
-    disease_full = prediction.prediction
-    if "___" not in disease_full:
+    parsed = split_prediction(prediction.prediction)
+    if parsed is None:
         raise HTTPException(status_code=400, detail="Format de prédiction invalide")
 
-    plant, disease = [part.strip().replace("_", " ") for part in disease_full.split("___")]
-
-    with open("DB/versionFinale.json", encoding="utf-8") as f:
-        all_data = json.load(f)
-
-    possibles = [
-        e for e in all_data
-        if e.get("Plant") and e.get("Disease")
-        and e["Plant"].strip().lower() == plant.lower()
-        and e["Disease"].strip().lower() == disease.lower()
-    ]
-
-    match = next(
-        (
-            e for e in possibles
-            if e.get("Gravité ciblée") == critere_gravite
-            and e.get("Stade recommandé") == critere_stade
-            and str(e.get("DAR")).strip() == critere_dar
-        ),
-        None
-    )
+    plant, disease = parsed
+    match = await treatment_index.match(plant, disease, critere_gravite, critere_stade, critere_dar)
 
     if not match:
         raise HTTPException(status_code=404, detail="Aucune matière active ne correspond à ces critères")
@@ -142,7 +291,7 @@ async def recommend_matiere(
     prediction.critere_gravite = critere_gravite
     prediction.critere_stade = critere_stade
     prediction.critere_dar = critere_dar
-    session.commit()
+    await session.commit()
 
     return {
         "recommended_matiere": matiere,
@@ -155,6 +304,8 @@ class ImagePredictionOutput(BaseModel):
     id: int
     filename: str
     prediction: str
+    confidence: float | None = None
+    top_k: list[dict] = []
     file_path: str
     timestamp: datetime.datetime
     plant: str | None = None
@@ -168,41 +319,64 @@ class ImagePredictionOutput(BaseModel):
     class Config:
         orm_mode = True
 
-    @staticmethod
-    def from_orm_custom(pred: ImagePrediction, request: Request) -> "ImagePredictionOutput":
-        base_url = str(request.base_url).rstrip("/")
-        return ImagePredictionOutput(
-            id=pred.id,
-            filename=pred.filename,
-            prediction=pred.prediction,
-            file_path=pred.file_path,
-            timestamp=pred.timestamp,
-            plant=pred.plant,
-            disease=pred.disease,
-            recommended_matiere=pred.recommended_matiere,
-            critere_gravite=pred.critere_gravite,
-            critere_stade=pred.critere_stade,
-            critere_dar=pred.critere_dar,
-            image_url=f"{base_url}/disease/image/{pred.file_path}"
-        )
+
+# Colonnes lues par l'historique (tout sauf user_id), sans hydrater d'objets ORM
+PREDICTION_COLUMNS = (
+    ImagePrediction.id, ImagePrediction.filename, ImagePrediction.prediction, ImagePrediction.confidence,
+    ImagePrediction.top_k, ImagePrediction.file_path, ImagePrediction.timestamp, ImagePrediction.plant,
+    ImagePrediction.disease, ImagePrediction.recommended_matiere, ImagePrediction.critere_gravite,
+    ImagePrediction.critere_stade, ImagePrediction.critere_dar,
+)
+
+
+def image_url_prefix(request: Request) -> str:
+    """Calculé une fois par requête, pas pour chaque ligne."""
+    return f"{str(request.base_url).rstrip('/')}/disease/image/"
+
+
+def prediction_fields(row, image_prefix: str) -> dict:
+    """Ligne PREDICTION_COLUMNS -> dict au format ImagePredictionOutput."""
+    return {
+        "id": row.id,
+        "filename": row.filename,
+        "prediction": row.prediction,
+        "confidence": row.confidence,
+        "top_k": disease_model.decode_top_k(row.top_k),
+        "file_path": row.file_path,
+        "timestamp": row.timestamp,
+        "plant": row.plant,
+        "disease": row.disease,
+        "recommended_matiere": row.recommended_matiere,
+        "critere_gravite": row.critere_gravite,
+        "critere_stade": row.critere_stade,
+        "critere_dar": row.critere_dar,
+        "image_url": f"{image_prefix}{row.file_path}",
+    }
 
 
 @router.get("/image/{path_id}", response_class=FileResponse)
 async def get_plant_image(path_id: str):
-    image_path = f"storage/plants/{path_id}"
+    image_path = f"{PLANT_STORAGE}/{path_id}"
     if not Path(image_path).exists():
         raise HTTPException(status_code=404, detail="Image not found")
     return FileResponse(image_path)
 
 
-@router.get("/image-predictions/")
+@router.get("/image-predictions/", response_model=Page[ImagePredictionOutput])
 async def get_image_predictions(
     request: Request,
-    db: Session = Depends(get_session),
-    user: UserDB = Depends(get_current_user)
-
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_session),
+    user_id: int = Depends(get_current_user_id)
 ):
-    predictions = db.query(ImagePrediction).filter(ImagePrediction.user_id == user.id).all()
-    return [ImagePredictionOutput.from_orm_custom(p, request) for p in predictions]
+    """Historique des prédictions, du plus récent au plus ancien (`?cursor=` = next_cursor précédent)."""
+    stmt = page.apply(select(*PREDICTION_COLUMNS).where(ImagePrediction.user_id == user_id), ImagePrediction.id)
+    rows, next_cursor = page.page((await db.execute(stmt)).all())
+    image_prefix = image_url_prefix(request)
+    # Réponse sérialisée directement par orjson (response_model ne sert qu'à la documentation)
+    return ORJSONResponse({
+        "items": [prediction_fields(row, image_prefix) for row in rows],
+        "next_cursor": next_cursor,
+    })
 
 
@@ -1,13 +1,17 @@
 from fastapi import APIRouter, HTTPException, Depends
-from typing import List
-from sqlalchemy.orm import Session
-from DB.models import Base, IrrigationRecord, UserDB
-from DB.database import engine, get_session
-from Irrigation.schemes import IrrigationInput, IrrigationOutput
-from Irrigation.crud import create_irrigation_record, get_record_by_id
-from Irrigation.IrrigationLogic import calculate_irrigation
-from Irrigation.WeatherCheck import check_weather_before_irrigation
-from security import get_current_user
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from DB.models import Base, IrrigationRecord, ParcelleNote
+from DB.database import engine, get_async_session
+from Irrigation.schemes import IrrigationInput, IrrigationOutput, IrrigationPlanInput
+from Irrigation.crud import create_irrigation_record, create_irrigation_records, get_record_by_id
+from Irrigation.IrrigationLogic import (
+    calculate_irrigation, calculate_irrigation_many, irrigation_table, IrrigationLookupError, saison_courante,
+    irrigation_necessaire
+)
+from Irrigation.WeatherCheck import check_weather_before_irrigation, weather_service, LATITUDE, LONGITUDE
+from pagination import Page, PageParams
+from security import get_current_user, get_current_user_id, UserSnapshot
 import logging
 
 Base.metadata.create_all(bind=engine)
@@ -19,10 +23,10 @@ logger = logging.getLogger(__name__)
 
 @router.post("/recommend-irrigation/", response_model=IrrigationOutput)
 async def recommend_irrigation(data: IrrigationInput,
-                               db: Session = Depends(get_session),
-                               current_user: UserDB = Depends(get_current_user)):
+                               db: AsyncSession = Depends(get_async_session),
+                               current_user: UserSnapshot = Depends(get_current_user)):
     try:
-        recommendation = calculate_irrigation(
+        recommendation = await calculate_irrigation(
             culture=data.culture,
             type_sol=data.type_sol,
             saison=data.saison,
@@ -30,39 +34,116 @@ async def recommend_irrigation(data: IrrigationInput,
         )
         recommendation["irrigation_necessaire"] = True
         recommendation["user_id"] = current_user.id
-        record = create_irrigation_record(db, recommendation)
+        recommendation["latitude"] = data.latitude
+        recommendation["longitude"] = data.longitude
+        record = await create_irrigation_record(db, recommendation)
         return {**recommendation, "id": record.id, "timestamp": record.timestamp}
+    except IrrigationLookupError as e:
+        raise HTTPException(status_code=400, detail={"message": str(e), **(await irrigation_table.options())})
     except Exception as e:
         logger.error(f"Error in recommend_irrigation: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/irrigation-records/", response_model=List[IrrigationOutput])
+@router.post("/plan/")
+async def plan_irrigation(data: IrrigationPlanInput,
+                          db: AsyncSession = Depends(get_async_session),
+                          current_user: UserSnapshot = Depends(get_current_user)):
+    """
+    Plan d'irrigation de toute l'exploitation : toutes les parcelles de l'utilisateur
+    (ou la liste envoyée) calculées en une passe, avec les volumes totaux par jour et par semaine.
+    """
+    saison = data.saison or saison_courante()
+    if data.parcelles is not None:
+        items = [{**p.dict(), "saison": p.saison or saison} for p in data.parcelles]
+    else:
+        parcelles = (await db.execute(select(
+            ParcelleNote.id, ParcelleNote.numero_parcelle, ParcelleNote.culture,
+            ParcelleNote.type_sol, ParcelleNote.systeme_irrigation, ParcelleNote.superficie
+        ).where(ParcelleNote.user_id == current_user.id))).all()
+        items = [
+            {"parcelle_id": p.id, "nom": p.numero_parcelle, "culture": p.culture, "type_sol": p.type_sol,
+             "type_irrigation": p.systeme_irrigation, "saison": saison, "superficie": p.superficie}
+            for p in parcelles
+        ]
+
+    results, errors = await calculate_irrigation_many(items)
+    for result in results:
+        item = items[result["index"]]
+        result["parcelle_id"] = item.get("parcelle_id")
+        result["nom"] = item.get("nom")
+    for error in errors:
+        error["parcelle_id"] = items[error["index"]].get("parcelle_id")
+
+    if data.enregistrer and results:
+        ids = await create_irrigation_records(db, [
+            {**r, "user_id": current_user.id,
+             "latitude": items[r["index"]].get("latitude"), "longitude": items[r["index"]].get("longitude")}
+            for r in results
+        ])
+        for result, record_id in zip(results, ids):
+            result["id"] = record_id
+
+    total_jour = sum(r["volume_m3_jour"] for r in results)
+    return {
+        "saison": saison,
+        "parcelles": results,
+        "erreurs": errors,
+        "total_superficie": sum(r["superficie"] for r in results),
+        "total_m3_jour": round(total_jour, 2),
+        "total_m3_semaine": round(total_jour * 7, 2),
+    }
+
+
+@router.get("/options/")
+async def get_irrigation_options():
+    """Valeurs acceptées pour les listes déroulantes (cultures, types de sol, saisons, systèmes)."""
+    return await irrigation_table.options()
+
+
+@router.get("/irrigation-records/", response_model=Page[IrrigationOutput])
 async def get_irrigation_records(
-        db: Session = Depends(get_session),
-        current_user: UserDB = Depends(get_current_user)
+        page: PageParams = Depends(),
+        db: AsyncSession = Depends(get_async_session),
+        user_id: int = Depends(get_current_user_id)
 ):
-    records = db.query(IrrigationRecord).filter(IrrigationRecord.user_id == current_user.id).all()
-    return [IrrigationOutput.from_orm(record) for record in records]
+    stmt = page.apply(select(IrrigationRecord).where(IrrigationRecord.user_id == user_id), IrrigationRecord.id)
+    records, next_cursor = page.page((await db.scalars(stmt)).all())
+    return {"items": [IrrigationOutput.from_orm(record) for record in records], "next_cursor": next_cursor}
 
 
 @router.get("/check-irrigation/{record_id}")
-async def check_irrigation_status(record_id: int, db: Session = Depends(get_session)):
-    record = get_record_by_id(db, record_id)
+async def check_irrigation_status(record_id: int, db: AsyncSession = Depends(get_async_session)):
+    """
+    Décision tenue à jour par le scheduler (Irrigation/scheduler.py) : simple lecture par clé primaire.
+    Une recommandation pas encore traitée par le scheduler est calculée à la demande pour sa maille.
+    """
+    record = await get_record_by_id(db, record_id)
     if not record:
         raise HTTPException(status_code=404, detail="Recommandation introuvable.")
-    weather_ok = await check_weather_before_irrigation()
-    return {"irrigation_necessaire": weather_ok}
+    if record.meteo_updated_at is None:
+        cell = record.weather_cell or weather_service.cell_key(LATITUDE, LONGITUDE)
+        pluie_mm = await check_weather_before_irrigation(*weather_service.parse_cell_key(cell))
+        return {
+            "irrigation_necessaire": irrigation_necessaire(record.besoin_par_seance, pluie_mm),
+            "pluie_prevue_mm": pluie_mm,
+            "meteo_mise_a_jour": None,
+        }
+    return {
+        "irrigation_necessaire": record.irrigation_necessaire,
+        "pluie_prevue_mm": record.pluie_prevue_mm,
+        "meteo_mise_a_jour": record.meteo_updated_at,
+    }
 
 
 @router.delete("/irrigation-records/{record_id}", status_code=204)
-async def delete_irrigation_record(record_id: int, db: Session = Depends(get_session), current_user: UserDB = Depends(get_current_user)):
-    record = db.query(IrrigationRecord).filter(
+async def delete_irrigation_record(record_id: int, db: AsyncSession = Depends(get_async_session), current_user: UserSnapshot = Depends(get_current_user)):
+    record = await db.scalar(select(IrrigationRecord).where(
         IrrigationRecord.id == record_id,
         IrrigationRecord.user_id == current_user.id
-    ).first()
+    ))
     if not record:
         raise HTTPException(status_code=404, detail="Recommandation non trouvée")
-    db.delete(record)
-    db.commit()
+    await db.delete(record)
+    await db.commit()
     return
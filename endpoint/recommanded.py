@@ -1,14 +1,23 @@
 import datetime
-from fastapi import HTTPException, Depends, APIRouter
+import io
+from collections import Counter
+import pandas as pd
+from fastapi import HTTPException, Depends, APIRouter, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from ai.RecCultures.recommanders import recommender_model
-from DB.database import get_session
-from DB.models import CropRecommendation, UserDB
-from security import get_current_user
+from config import env
+from DB.database import get_async_session
+from DB.models import CropRecommendation
+from pagination import Page, PageParams
+from security import get_current_user, get_current_user_id, UserSnapshot
 
 router = APIRouter()
 
+MAX_BATCH_ROWS = int(env("RECOMMEND_MAX_BATCH_ROWS", 100000))
+
 
 class SoilDetails(BaseModel):
     N: float
@@ -39,8 +48,8 @@ class CropRecommendationOutput(BaseModel):
 @router.post("/recommend-crop/")
 async def recommend_crop(
     soil_details: SoilDetails,
-    session: Session = Depends(get_session),
-    user: UserDB = Depends(get_current_user)
+    session: AsyncSession = Depends(get_async_session),
+    user: UserSnapshot = Depends(get_current_user)
 ):
     try:
         print("Received soil details:", soil_details)
@@ -63,8 +72,7 @@ async def recommend_crop(
         )
 
         session.add(crop_recommendation)
-        session.commit()
-        session.refresh(crop_recommendation)
+        await session.commit()
         print("Recommendation saved to DB with id:", crop_recommendation.id)
 
         return {"recommended_crop": recommended_crop}
@@ -74,13 +82,94 @@ async def recommend_crop(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/crop-recommendations/", response_model=list[CropRecommendationOutput])
+def _read_soil_table(content_type: str, body: bytes, filename: str = ""):
+    """JSON (liste de SoilDetails), CSV ou Parquet -> DataFrame."""
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    filename = (filename or "").lower()
+    try:
+        if content_type == "application/json" or filename.endswith(".json"):
+            return pd.read_json(io.BytesIO(body), orient="records")
+        if "parquet" in content_type or filename.endswith(".parquet"):
+            return pd.read_parquet(io.BytesIO(body))
+        if content_type in ("text/csv", "application/csv") or filename.endswith(".csv"):
+            return pd.read_csv(io.BytesIO(body))
+    except (ValueError, OSError) as e:
+        raise HTTPException(status_code=400, detail=f"Fichier illisible : {e}")
+    except ImportError:
+        # Moteur Parquet (pyarrow) absent de l'installation
+        raise HTTPException(status_code=415, detail="Parquet non pris en charge sur ce serveur : envoyez du JSON ou du CSV")
+    raise HTTPException(status_code=415, detail="Formats acceptés : JSON, CSV ou Parquet")
+
+
+def _soil_matrix(table):
+    """Contrôle des colonnes et conversion en matrice float (ordre des champs de SoilDetails)."""
+    features = list(SoilDetails.__fields__)
+    missing = [c for c in features if c not in table.columns]
+    if missing:
+        raise HTTPException(status_code=422, detail=f"Colonnes manquantes : {', '.join(missing)}")
+    if len(table) == 0:
+        raise HTTPException(status_code=400, detail="Aucune ligne à traiter")
+    if len(table) > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413, detail=f"Maximum {MAX_BATCH_ROWS} lignes par lot")
+
+    values = table[features].apply(pd.to_numeric, errors="coerce")
+    invalid = values.index[values.isna().any(axis=1)].tolist()
+    if invalid:
+        raise HTTPException(status_code=422, detail=f"Valeurs non numériques aux lignes : {invalid[:20]}")
+    return features, values.to_numpy(dtype=float)
+
+
+@router.post("/recommend-crop/batch")
+async def recommend_crop_batch(
+    request: Request,
+    session: AsyncSession = Depends(get_async_session),
+    user: UserSnapshot = Depends(get_current_user)
+):
+    """
+    Recommandation en lot (imports de laboratoires de sol).
+    Corps JSON (liste de SoilDetails), CSV ou Parquet, ou fichier multipart dans le champ "file".
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or not hasattr(upload, "read"):
+            raise HTTPException(status_code=400, detail="Champ 'file' manquant")
+        table = await run_in_threadpool(
+            _read_soil_table, upload.content_type, await upload.read(), upload.filename
+        )
+    else:
+        table = await run_in_threadpool(_read_soil_table, content_type, await request.body())
+
+    features, X = _soil_matrix(table)
+    crops = await run_in_threadpool(recommender_model.predict_many, X)
+
+    timestamp = datetime.datetime.now(datetime.timezone.utc)
+    rows = [
+        {**dict(zip(features, sample)), "recommended_crop": str(crop), "user_id": user.id, "timestamp": timestamp}
+        for sample, crop in zip(X.tolist(), crops)
+    ]
+    await session.execute(insert(CropRecommendation), rows)
+    await session.commit()
+
+    return {
+        "count": len(rows),
+        "recommended_crops": [str(crop) for crop in crops],
+        "summary": dict(Counter(str(crop) for crop in crops).most_common())
+    }
+
+
+@router.get("/crop-recommendations/", response_model=Page[CropRecommendationOutput])
 async def get_crop_recommendations(
-    db: Session = Depends(get_session),
-    user: UserDB = Depends(get_current_user)
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_session),
+    user_id: int = Depends(get_current_user_id)
 ):
     try:
-        recommendations = db.query(CropRecommendation).filter(CropRecommendation.user_id == user.id).all()
-        return recommendations  # Now FastAPI will convert ORM models to Pydantic automatically
+        stmt = page.apply(
+            select(CropRecommendation).where(CropRecommendation.user_id == user_id), CropRecommendation.id
+        )
+        recommendations, next_cursor = page.page((await db.scalars(stmt)).all())
+        return {"items": recommendations, "next_cursor": next_cursor}  # FastAPI convertit les objets ORM
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,66 @@
+import bisect
+import threading
+
+
+class Histogram:
+    """Histogramme cumulatif minimaliste (compatible avec l'esprit Prometheus)."""
+
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+            self._count += 1
+            self._max = max(self._max, value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cumulative, buckets = 0, {}
+            for bound, count in zip(self.buckets + ["+Inf"], self._counts):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            return {
+                "count": self._count,
+                "sum": round(self._sum, 6),
+                "avg": round(self._sum / self._count, 6) if self._count else 0.0,
+                "max": round(self._max, 6),
+                "buckets": buckets,
+            }
+
+
+class Counter:
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self._value += amount
+
+    def snapshot(self) -> int:
+        return self._value
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def histogram(self, name: str, buckets) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(buckets))
+
+    def counter(self, name: str) -> Counter:
+        return self._metrics.setdefault(name, Counter())
+
+    def snapshot(self) -> dict:
+        return {name: metric.snapshot() for name, metric in sorted(self._metrics.items())}
+
+
+# Instance unique à utiliser partout
+metrics = MetricsRegistry()
@@ -0,0 +1,65 @@
+import base64
+import binascii
+from typing import Generic, List, Optional, TypeVar
+
+from fastapi import HTTPException, Query
+from pydantic.generics import GenericModel
+
+from config import env
+
+HISTORY_PAGE_SIZE = int(env("HISTORY_PAGE_SIZE", 50))
+HISTORY_MAX_PAGE_SIZE = int(env("HISTORY_MAX_PAGE_SIZE", 200))
+
+# Plus grand id représentable (INTEGER SQLite / BIGINT PostgreSQL)
+MAX_CURSOR_ID = 2 ** 63 - 1
+
+T = TypeVar("T")
+
+
+class Page(GenericModel, Generic[T]):
+    """Réponse commune des historiques : `next_cursor` vaut None sur la dernière page."""
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(str(last_id).encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        last_id = int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii"))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+    if not 0 < last_id <= MAX_CURSOR_ID:
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+    return last_id
+
+
+class PageParams:
+    """
+    Dépendance `?cursor=...&limit=...` : pagination par clé (keyset) sur l'id, du plus récent
+    au plus ancien. Chaque page est un parcours de l'index (user_id, id), quelle que soit sa profondeur.
+    """
+
+    def __init__(
+        self,
+        cursor: Optional[str] = Query(None, description="next_cursor de la page précédente"),
+        limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+    ):
+        self.before_id = decode_cursor(cursor) if cursor else None
+        self.limit = limit
+
+    def apply(self, stmt, id_column):
+        """Restreint une requête `select` à la page demandée (une ligne de plus pour savoir s'il en reste)."""
+        if self.before_id is not None:
+            stmt = stmt.where(id_column < self.before_id)
+        return stmt.order_by(id_column.desc()).limit(self.limit + 1)
+
+    def page(self, rows) -> tuple:
+        """(lignes de la page, next_cursor) à partir du résultat de `apply`."""
+        rows = list(rows)
+        if len(rows) <= self.limit:
+            return rows, None
+        rows = rows[:self.limit]
+        return rows, encode_cursor(rows[-1].id)
@@ -1,3 +1,10 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -5,9 +12,11 @@ from typing import Optional
 from config import env
 from fastapi import HTTPException, Depends, Security, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from DB.database import get_session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from DB.database import get_async_session, SessionLocal
 from DB.models import UserDB
+from metrics import metrics
 import re
 from fastapi import HTTPException
 from typing import Optional
@@ -18,6 +27,13 @@ ALGORITHM = env("JWT_ALGORITHM", "HS256")
 
 expire_days = int(env("JWT_DAYS", 31))
 ACCESS_TOKEN_EXPIRE_MINUTES = expire_days * 24 * 60
+
+AUTH_CACHE_SIZE = int(env("AUTH_CACHE_SIZE", 10000))
+AUTH_CACHE_TTL = float(env("AUTH_CACHE_TTL", 60))
+
+# bcrypt libère le GIL : un thread par cœur suffit à saturer le CPU
+PASSWORD_WORKERS = int(env("PASSWORD_WORKERS", os.cpu_count() or 2))
+PASSWORD_MAX_PENDING = int(env("PASSWORD_MAX_PENDING", PASSWORD_WORKERS * 8))
 # Contexte de hachage pour sécuriser les mots de passe
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -32,6 +48,57 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+class PasswordPool:
+    """
+    bcrypt (~200-300 ms par appel) exécuté sur un pool de threads borné plutôt que sur l'event loop.
+    Au-delà de `max_pending` opérations en cours ou en attente, les nouvelles demandes sont
+    refusées en 429 au lieu de faire grossir la file indéfiniment.
+    """
+
+    def __init__(self, workers: int = PASSWORD_WORKERS, max_pending: int = PASSWORD_MAX_PENDING):
+        self.workers = max(1, workers)
+        self.max_pending = max(self.workers, max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.rejected = metrics.counter("password_pool_rejected")
+        self.wait_hist = metrics.histogram(
+            "password_pool_seconds", [0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+        )
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected.inc()
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Serveur occupé, veuillez réessayer.",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+            self.wait_hist.observe(time.perf_counter() - start)
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+
+password_pool = PasswordPool()
+
+
+async def hash_password_async(password: str) -> str:
+    return await password_pool.run(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_pool.run(verify_password, plain_password, hashed_password)
+
 # Fonction pour créer un token JWT
 def create_token(
     data: dict,
@@ -52,28 +119,143 @@ def decode_token(token: str) -> dict:
     except JWTError as e:
         raise JWTError("Token invalide ou expiré") from e
 
-# Fonction dépendance pour récupérer l'utilisateur connecté via token JWT
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Security(oauth2_scheme),
-    db: Session = Depends(get_session)
-) -> UserDB:
-    token = credentials.credentials
-    try:
+@dataclass(frozen=True)
+class UserSnapshot:
+    """Champs de l'utilisateur connecté, sans session SQLAlchemy (lecture seule)."""
+    id: int
+    nom: str
+    prenom: str
+    adresse: str
+    email: str
+    tel: str
+    image: Optional[str]
+
+    @classmethod
+    def from_orm(cls, user: UserDB) -> "UserSnapshot":
+        return cls(id=user.id, nom=user.nom, prenom=user.prenom, adresse=user.adresse,
+                   email=user.email, tel=user.tel, image=user.image)
+
+
+class AuthCache:
+    """
+    Cache par worker des jetons déjà vérifiés (jeton -> email, expiration), des
+    utilisateurs correspondants (email -> UserSnapshot) et de leurs identifiants
+    (email -> id, pour get_current_user_id), en LRU + TTL.
+    update-profile et delete-account invalident l'utilisateur ; les autres workers
+    le voient au plus tard après AUTH_CACHE_TTL secondes.
+    """
+
+    def __init__(self, max_size: int = AUTH_CACHE_SIZE, ttl: float = AUTH_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._tokens = OrderedDict()  # jeton -> (email, exp du jeton)
+        self._users = OrderedDict()  # email -> (UserSnapshot, expire_at)
+        self._ids = OrderedDict()  # email -> (id, expire_at)
+        self._lock = threading.Lock()
+        self.hits = metrics.counter("auth_cache_hits")
+        self.misses = metrics.counter("auth_cache_misses")
+
+    def _put(self, entries: OrderedDict, key, value):
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > self.max_size:
+            entries.popitem(last=False)
+
+    def email(self, token: str) -> str:
+        """Email (claim `sub`) d'un jeton valide ; lève JWTError sinon."""
+        now = time.time()
+        with self._lock:
+            cached = self._tokens.get(token)
+            if cached is not None and cached[1] > now:
+                self._tokens.move_to_end(token)
+                return cached[0]
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email = payload.get("sub")
         if not email:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token invalide")
+            raise JWTError("Token sans sujet")
+        with self._lock:
+            self._put(self._tokens, token, (email, payload.get("exp", now + self.ttl)))
+        return email
+
+    def user(self, email: str) -> Optional[UserSnapshot]:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._users.get(email)
+            if cached is not None and cached[1] > now:
+                self._users.move_to_end(email)
+                self.hits.inc()
+                return cached[0]
+        self.misses.inc()
+        with SessionLocal() as db:
+            user = db.query(UserDB).filter(UserDB.email == email).first()
+            snapshot = UserSnapshot.from_orm(user) if user else None
+        if snapshot is not None:
+            with self._lock:
+                self._put(self._users, email, (snapshot, now + self.ttl))
+                self._put(self._ids, email, (snapshot.id, now + self.ttl))
+        return snapshot
+
+    def user_id(self, email: str) -> Optional[int]:
+        """Identifiant seul : ne lit que la colonne id en cas d'absence, sans construire d'instantané."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._ids.get(email)
+            if cached is not None and cached[1] > now:
+                self._ids.move_to_end(email)
+                self.hits.inc()
+                return cached[0]
+        self.misses.inc()
+        with SessionLocal() as db:
+            user_id = db.scalar(select(UserDB.id).where(UserDB.email == email))
+        if user_id is not None:
+            with self._lock:
+                self._put(self._ids, email, (user_id, now + self.ttl))
+        return user_id
+
+    def invalidate(self, email: str):
+        with self._lock:
+            self._users.pop(email, None)
+            self._ids.pop(email, None)
+
 
-        user = db.query(UserDB).filter(UserDB.email == email).first()
-        if not user:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Utilisateur non trouvé")
+auth_cache = AuthCache()
 
-        return user
 
+def _token_email(credentials: HTTPAuthorizationCredentials) -> str:
+    try:
+        return auth_cache.email(credentials.credentials)
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token invalide")
 
 
+# Fonction dépendance pour récupérer l'utilisateur connecté via token JWT
+def get_current_user(credentials: HTTPAuthorizationCredentials = Security(oauth2_scheme)) -> UserSnapshot:
+    """Utilisateur connecté (instantané en cache, sans session de base de données)."""
+    user = auth_cache.user(_token_email(credentials))
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Utilisateur non trouvé")
+    return user
+
+
+def get_current_user_id(credentials: HTTPAuthorizationCredentials = Security(oauth2_scheme)) -> int:
+    """Variante pour les endpoints qui n'ont besoin que de l'identifiant (sans instantané)."""
+    user_id = auth_cache.user_id(_token_email(credentials))
+    if user_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Utilisateur non trouvé")
+    return user_id
+
+
+async def get_current_user_db(
+    credentials: HTTPAuthorizationCredentials = Security(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_session)
+) -> UserDB:
+    """Utilisateur connecté chargé dans la session de la requête (pour le modifier ou le supprimer)."""
+    user = await db.scalar(select(UserDB).where(UserDB.email == _token_email(credentials)))
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Utilisateur non trouvé")
+    return user
+
+
 def validate_tel(tel: str):
     """
     Valide un numéro de téléphone marocain :
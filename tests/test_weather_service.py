@@ -0,0 +1,125 @@
+"""
+WeatherService contre un serveur OpenWeather local (stub) : TTL, un seul appel amont
+par maille sous concurrence, stale-while-revalidate et taille du cache bornée.
+"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from Irrigation.WeatherCheck import WeatherService
+
+
+class StubOpenWeather:
+    """Répond à /data/2.5/forecast après `delay` secondes ; la pluie prévue vaut le numéro de l'appel."""
+
+    def __init__(self, delay: float = 0.2):
+        self.delay = delay
+        self.calls = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                stub.calls.append((float(query["lat"][0]), float(query["lon"][0])))
+                rain = float(len(stub.calls))
+                time.sleep(stub.delay)
+                body = json.dumps({"list": [{"rain": {"3h": rain}}]}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    server = StubOpenWeather()
+    yield server
+    server.close()
+
+
+def run(service: WeatherService, coroutine):
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await service.close()
+    return asyncio.run(main())
+
+
+def test_one_upstream_fetch_per_cell(stub):
+    service = WeatherService(base_url=stub.url, api_key="test", grid=0.1)
+
+    async def scenario():
+        # 200 appels concurrents sur deux mailles (points voisins dans chaque maille)
+        points = [(32.31 + (i % 3) * 0.01, -6.32) for i in range(100)]
+        points += [(33.58 + (i % 3) * 0.01, -7.61) for i in range(100)]
+        return await asyncio.gather(*(service.rain_next_24h(lat, lon) for lat, lon in points))
+
+    results = run(service, scenario())
+    assert len(results) == 200
+    assert sorted(stub.calls) == [(32.3, -6.3), (33.6, -7.6)]
+
+
+def test_ttl(stub):
+    service = WeatherService(base_url=stub.url, api_key="test", ttl=0.5, stale_while_revalidate=False)
+
+    async def scenario():
+        first = await service.rain_next_24h(32.33, -6.32)
+        cached = await service.rain_next_24h(32.33, -6.32)
+        await asyncio.sleep(0.6)
+        refreshed = await service.rain_next_24h(32.33, -6.32)
+        return first, cached, refreshed
+
+    first, cached, refreshed = run(service, scenario())
+    assert (first, cached, refreshed) == (1.0, 1.0, 2.0)
+    assert len(stub.calls) == 2
+
+
+def test_stale_while_revalidate(stub):
+    service = WeatherService(base_url=stub.url, api_key="test", ttl=0.3, stale_ttl=60)
+
+    async def scenario():
+        await service.rain_next_24h(32.33, -6.32)
+        await asyncio.sleep(0.4)
+        # Prévision expirée : servie tout de suite, rafraîchie en arrière-plan
+        start = time.perf_counter()
+        stale = await asyncio.gather(*(service.rain_next_24h(32.33, -6.32) for _ in range(50)))
+        elapsed = time.perf_counter() - start
+        await asyncio.sleep(stub.delay + 0.2)
+        fresh = await service.rain_next_24h(32.33, -6.32)
+        return stale, elapsed, fresh
+
+    stale, elapsed, fresh = run(service, scenario())
+    assert set(stale) == {1.0}
+    assert elapsed < stub.delay
+    assert fresh == 2.0
+    assert len(stub.calls) == 2
+
+
+def test_cache_is_bounded(stub):
+    stub.delay = 0
+    service = WeatherService(base_url=stub.url, api_key="test", max_size=2)
+
+    async def scenario():
+        for lat in (30.0, 31.0, 32.0):
+            await service.rain_next_24h(lat, -6.32)
+
+    run(service, scenario())
+    assert list(service._cache) == [service.cell(31.0, -6.32), service.cell(32.0, -6.32)]
@@ -0,0 +1,159 @@
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Optional
+from uuid import uuid4
+
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+from config import env
+
+UPLOAD_CHUNK_SIZE = int(env("UPLOAD_CHUNK_SIZE", 256 * 1024))
+
+# Plafonds par endpoint, vérifiés pendant la copie
+MAX_PROFILE_IMAGE_BYTES = int(env("UPLOAD_MAX_PROFILE_IMAGE_BYTES", 5 * 1024 * 1024))
+MAX_PLANT_IMAGE_BYTES = int(env("UPLOAD_MAX_PLANT_IMAGE_BYTES", 20 * 1024 * 1024))
+MAX_AUDIO_BYTES = int(env("UPLOAD_MAX_AUDIO_BYTES", 25 * 1024 * 1024))
+
+IMAGE_KINDS = ("jpeg", "png", "gif", "bmp", "webp")
+AUDIO_KINDS = ("wav", "mp3", "aac", "ogg", "flac", "mp4", "webm", "amr")
+
+# Extension des fichiers enregistrés, d'après le type reconnu
+EXTENSIONS = {"jpeg": "jpg", "mp4": "m4a"}
+
+SNIFF_BYTES = 16
+
+
+def sniff(head: bytes) -> Optional[str]:
+    """Type du fichier d'après ses premiers octets (signatures), None s'il n'est pas reconnu."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if head.startswith(b"BM"):
+        return "bmp"
+    if head.startswith(b"RIFF") and head[8:12] == b"WEBP":
+        return "webp"
+    if head.startswith(b"RIFF") and head[8:12] == b"WAVE":
+        return "wav"
+    if head.startswith(b"ID3"):
+        return "mp3"
+    if len(head) >= 2 and head[0] == 0xFF and head[1] & 0xF6 == 0xF0:
+        return "aac"  # ADTS
+    if len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0:
+        return "mp3"  # trame MPEG sans tag ID3
+    if head.startswith(b"OggS"):
+        return "ogg"
+    if head.startswith(b"fLaC"):
+        return "flac"
+    if head[4:8] == b"ftyp":
+        return "mp4"  # m4a, mp4, 3gp
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "webm"
+    if head.startswith(b"#!AMR"):
+        return "amr"
+    return None
+
+
+@dataclass(frozen=True)
+class StoredUpload:
+    path: str
+    size: int
+    sha256: str
+    kind: str
+
+
+def stored_filename(sha256: str, kind: str, name: Optional[str] = None) -> str:
+    """Nom sur disque : `name` (par défaut le sha256) + extension du type reconnu."""
+    return f"{name or sha256}.{EXTENSIONS.get(kind, kind)}"
+
+
+def check_kind(head: bytes, kinds: tuple) -> str:
+    """Type reconnu sur les premiers octets ; ValueError s'il n'est pas dans `kinds`."""
+    kind = sniff(head[:SNIFF_BYTES])
+    if kind not in kinds:
+        raise ValueError("Format de fichier non supporté")
+    return kind
+
+
+def save_bytes(data: bytes, directory: str, sha256: str, kind: str) -> str:
+    """
+    Enregistre un contenu déjà en mémoire (images d'un lot) sous le même nom que save_upload.
+    Les fichiers étant nommés par leur hash, un doublon exact n'est écrit qu'une fois.
+    """
+    path = os.path.join(directory, stored_filename(sha256, kind))
+    if os.path.exists(path):
+        return path
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f".{uuid4().hex}.tmp")
+    with open(tmp_path, "wb") as out:
+        out.write(data)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def save_upload(
+    upload: UploadFile,
+    directory: str,
+    *,
+    max_bytes: int,
+    kinds: tuple,
+    name: Optional[str] = None,
+    unsupported_detail: str = "Format de fichier non supporté",
+) -> StoredUpload:
+    """
+    Copie l'upload par blocs de UPLOAD_CHUNK_SIZE dans `directory` : jamais plus d'un bloc en mémoire.
+    Le type est reconnu sur les premiers octets (400 s'il n'est pas dans `kinds`), la taille est
+    plafonnée pendant la copie (413) et le sha256 calculé au fil de l'eau.
+    Le fichier est enregistré sous `name` (par défaut le sha256) suivi de l'extension du type reconnu,
+    et n'apparaît sous ce nom qu'une fois complet.
+    """
+    os.makedirs(directory, exist_ok=True)
+    head = b""
+    while len(head) < SNIFF_BYTES:
+        chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        head += chunk
+    kind = sniff(head)
+    if kind not in kinds:
+        raise HTTPException(status_code=400, detail=unsupported_detail)
+
+    tmp_path = os.path.join(directory, f".{uuid4().hex}.tmp")
+    digest, size = hashlib.sha256(), 0
+    out = open(tmp_path, "wb")
+    try:
+        chunk = head
+        while chunk:
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(
+                    status_code=413, detail=f"Fichier trop volumineux (maximum {max_bytes / (1024 * 1024):g} Mo)"
+                )
+            digest.update(chunk)
+            await run_in_threadpool(out.write, chunk)
+            chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+        out.close()
+        sha256 = digest.hexdigest()
+        path = os.path.join(directory, stored_filename(sha256, kind, name))
+        os.replace(tmp_path, path)
+    except BaseException:
+        out.close()
+        _remove(tmp_path)
+        raise
+    return StoredUpload(path=path, size=size, sha256=sha256, kind=kind)
+
+
+def discard(stored: StoredUpload):
+    """Supprime un fichier reçu qui n'est plus utile (fichier temporaire, erreur après réception)."""
+    _remove(stored.path)
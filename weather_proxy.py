@@ -0,0 +1,109 @@
+import asyncio
+import hashlib
+import importlib.util
+import time
+
+import httpx
+
+from config import env
+from metrics import metrics
+
+WEATHER_API_URL = env("WEATHER_API_URL", "http://api.weatherapi.com/v1/current.json")
+# Les conditions actuelles de weatherapi.com ne changent qu'environ toutes les 15 minutes
+WEATHER_PROXY_TTL = float(env("WEATHER_PROXY_TTL", 5 * 60))
+WEATHER_PROXY_CACHE_SIZE = int(env("WEATHER_PROXY_CACHE_SIZE", 2048))
+# HTTP/2 uniquement si le paquet h2 est installé (httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class CurrentWeatherProxy:
+    """
+    Proxy vers weatherapi.com : un client httpx partagé (keep-alive, HTTP/2 si disponible),
+    réponses mises en cache par (clé API, q, aqi) et une seule requête amont par clé de cache à la fois.
+    La clé API fait partie de la clé de cache : un appelant n'obtient jamais une réponse
+    (200 ou erreur) obtenue avec la clé d'un autre.
+    """
+
+    def __init__(self, url: str = WEATHER_API_URL, ttl: float = WEATHER_PROXY_TTL,
+                 max_size: int = WEATHER_PROXY_CACHE_SIZE):
+        self.url = url
+        self.ttl = ttl
+        self.max_size = max_size
+        self._client = None
+        self._cache = {}  # (hash clé API, q, aqi) -> (réponse, expire_at)
+        self._inflight = {}  # (hash clé API, q, aqi) -> tâche en cours
+        self.latency_hist = metrics.histogram(
+            "weather_proxy_upstream_seconds", [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+        )
+        self.upstream_errors = metrics.counter("weather_proxy_upstream_errors")
+        self.cache_hits = metrics.counter("weather_proxy_cache_hits")
+
+    def start(self):
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                timeout=httpx.Timeout(10.0, connect=5.0),
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60),
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @staticmethod
+    def cache_key(key: str, q: str, aqi: str) -> tuple:
+        # Hash de la clé API : la clé elle-même n'est pas conservée en mémoire
+        key_hash = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return key_hash, " ".join(q.split()).casefold(), aqi.strip().casefold()
+
+    async def _fetch(self, cache_key: tuple, params: dict):
+        start = time.perf_counter()
+        try:
+            response = await self.start().get(self.url, params=params)
+        except httpx.HTTPError:
+            self.upstream_errors.inc()
+            raise
+        finally:
+            self.latency_hist.observe(time.perf_counter() - start)
+
+        if response.status_code != 200:
+            self.upstream_errors.inc()
+            return response.status_code, None
+
+        payload = response.json()
+        self._cache[cache_key] = (payload, time.monotonic() + self.ttl)
+        if len(self._cache) > self.max_size:
+            self._evict()
+        return 200, payload
+
+    def _evict(self):
+        now = time.monotonic()
+        for key in [k for k, (_, expires_at) in self._cache.items() if expires_at < now]:
+            del self._cache[key]
+        # Puis les plus anciennes insertions si la limite est toujours dépassée
+        while len(self._cache) > self.max_size:
+            del self._cache[next(iter(self._cache))]
+
+    async def get(self, key: str, q: str, aqi: str = "no"):
+        """Renvoie (status_code, json) ; seules les réponses 200 sont mises en cache."""
+        cache_key = self.cache_key(key, q, aqi)
+        cached = self._cache.get(cache_key)
+        if cached is not None and cached[1] > time.monotonic():
+            self.cache_hits.inc()
+            return 200, cached[0]
+
+        task = self._inflight.get(cache_key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(
+                self._fetch(cache_key, {"key": key, "q": q, "aqi": aqi})
+            )
+            self._inflight[cache_key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(cache_key, None))
+        # shield : un client qui se déconnecte n'annule pas la requête partagée
+        return await asyncio.shield(task)
+
+
+# Instance partagée par tous les handlers du worker
+weather_proxy = CurrentWeatherProxy()